@@ -1,10 +1,17 @@
+import argparse
 import asyncio
+import csv
+import hashlib
 import logging
 import os
 import random
+import shutil
 import subprocess
+import tempfile
+import time
+from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 import yaml
 from tqdm import tqdm
@@ -19,7 +26,255 @@ def sanitize_path(path: str) -> str:
     """Sanitize the input path to prevent directory traversal."""
     return os.path.normpath(path).lstrip(os.sep)
 
-def generate_compiler_cmd(compiler: str, source_file: str, output_file: str, obfuscate: bool) -> List[str]:
+def placeholder_argv(cmd: List[str], source_file: Path, output_file: Path) -> List[str]:
+    """cmd with the source and output paths replaced by placeholders, so it only describes how a file is built."""
+    placeholders = {str(source_file): "<src>", str(output_file): "<out>"}
+    return [placeholders.get(a, a) for a in cmd]
+
+class BuildCache:
+    """Content-addressed store of compiled outputs.
+
+    Entries are keyed by the source hash, the compiler, its version, the full argv (with the
+    source and output paths replaced by placeholders) and, when the argv uses a precompiled header,
+    the hash of the PCH file, since a rebuilt PCH keeps its path. A hit is hard-linked into place instead of
+    recompiled. Entries are evicted least-recently-used first once the cache exceeds max_size_gb.
+    """
+
+    def __init__(self, cache_dir: str, max_size_gb: float):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_size_gb * 1024 ** 3)
+        self.hits = 0
+        self.misses = 0
+        self._versions: Dict[str, str] = {}
+        self._pch_digests: Dict[tuple, str] = {}
+
+    def compiler_version(self, compiler: str) -> str:
+        if compiler not in self._versions:
+            try:
+                result = subprocess.run([compiler, "--version"], capture_output=True, text=True)
+                self._versions[compiler] = result.stdout.splitlines()[0] if result.stdout else ""
+            except OSError:
+                self._versions[compiler] = ""
+        return self._versions[compiler]
+
+    def pch_digest(self, cmd: List[str]) -> Optional[str]:
+        """sha256 of the PCH file cmd uses, or None if it uses none. Cached per path, mtime and size."""
+        pch_file = None
+        for flag, value in zip(cmd, cmd[1:]):
+            if flag == "-include-pch":
+                pch_file = Path(value)
+            elif flag == "-include" and Path(value + ".gch").exists():
+                pch_file = Path(value + ".gch")
+        if pch_file is None:
+            return None
+        try:
+            stat = pch_file.stat()
+        except OSError:
+            return None
+        stamp = (str(pch_file), stat.st_mtime_ns, stat.st_size)
+        if stamp not in self._pch_digests:
+            self._pch_digests[stamp] = hashlib.sha256(pch_file.read_bytes()).hexdigest()
+        return self._pch_digests[stamp]
+
+    def key(self, compiler: str, cmd: List[str], source_file: Path, output_file: Path) -> str:
+        digest = hashlib.sha256()
+        digest.update(source_file.read_bytes())
+        pch_digest = self.pch_digest(cmd)
+        if pch_digest:
+            digest.update(pch_digest.encode())
+        digest.update(b"\0".join(part.encode() for part in
+                                 [compiler, self.compiler_version(compiler)] + placeholder_argv(cmd, source_file, output_file)))
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def fetch(self, key: str, output_file: Path) -> bool:
+        """Put the cached output for key at output_file. Returns False on a miss."""
+        entry = self._entry(key)
+        if not entry.exists():
+            self.misses += 1
+            return False
+        os.utime(entry)  # mtime doubles as the LRU timestamp
+        if output_file.exists():
+            output_file.unlink()
+        try:
+            os.link(entry, output_file)
+        except OSError:
+            shutil.copy2(entry, output_file)
+        self.hits += 1
+        return True
+
+    def store(self, key: str, output_file: Path):
+        entry = self._entry(key)
+        if entry.exists() or not output_file.exists():
+            return
+        entry.parent.mkdir(exist_ok=True)
+        try:
+            os.link(output_file, entry)
+        except OSError:
+            shutil.copy2(output_file, entry)
+
+    def evict(self):
+        entries = [(e.stat().st_mtime, e.stat().st_size, e) for e in self.cache_dir.glob("*/*")]
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry.unlink()
+            total -= size
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        print(f"Build cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)")
+
+class BuildManifest:
+    """CSV record of how every (mode, source, compiler) output was built.
+
+    Each pair draws its obfuscation flags from a seed derived from the base seed and the pair
+    itself, so the same flags are chosen on every run and on every machine. The argv is recorded
+    with the source and output paths replaced by placeholders and without the PCH arguments, which
+    depend on the run rather than on the pair. An entry whose source hash, seed, argv and output are
+    unchanged is not rebuilt, so editing the compiler options or the flag generator rebuilds it.
+    """
+
+    FIELDS = ["mode", "source", "compiler", "seed", "source_sha256", "flags", "argv", "output", "status"]
+
+    def __init__(self, path: str, base_seed: int):
+        self.path = Path(path)
+        self.base_seed = base_seed
+        self.entries: Dict[tuple, Dict[str, str]] = {}
+        if self.path.exists():
+            with open(self.path, newline="") as f:
+                for row in csv.DictReader(f):
+                    self.entries[(row["mode"], row["source"], row["compiler"])] = row
+
+    def seed(self, mode: str, source: str, compiler: str) -> int:
+        digest = hashlib.sha256(f"{self.base_seed}:{mode}:{compiler}:{source}".encode()).digest()
+        return int.from_bytes(digest[:8], "little")
+
+    def is_current(self, mode: str, source: str, compiler: str, seed: int, source_sha256: str, argv: List[str],
+                   output_file: Path) -> bool:
+        entry = self.entries.get((mode, source, compiler))
+        return (entry is not None and entry["status"] == "ok" and entry["seed"] == str(seed)
+                and entry["source_sha256"] == source_sha256 and entry.get("argv") == " ".join(argv)
+                and output_file.exists())
+
+    def record(self, mode: str, source: str, compiler: str, seed: int, source_sha256: str, argv: List[str],
+               output_file: Path, ok: bool):
+        self.entries[(mode, source, compiler)] = {
+            "mode": mode, "source": source, "compiler": compiler, "seed": str(seed),
+            "source_sha256": source_sha256, "flags": " ".join(argv[4:]), "argv": " ".join(argv),
+            "output": str(output_file), "status": "ok" if ok else "failed",
+        }
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+            writer.writeheader()
+            writer.writerows(self.entries[k] for k in sorted(self.entries))
+        os.replace(tmp_path, self.path)
+
+def leading_includes(source_file: Path) -> Optional[Tuple[str, ...]]:
+    """System headers included at the very top of a source, before any other code or directive.
+
+    Returns None when the source cannot be read.
+    """
+    includes = []
+    in_comment = False
+    try:
+        with open(source_file, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.strip()
+                if in_comment:
+                    in_comment = "*/" not in line
+                    continue
+                if not line or line.startswith("//"):
+                    continue
+                if line.startswith("/*"):
+                    in_comment = "*/" not in line
+                    continue
+                if line.startswith("#include") and "<" in line and ">" in line:
+                    includes.append(line[line.index("<") + 1:line.index(">")].strip())
+                    continue
+                break
+    except OSError:
+        return None
+    return tuple(includes)
+
+class PrecompiledHeaders:
+    """Optional precompiled-header mode.
+
+    The most common set of leading system includes across the corpus is compiled once per
+    (compiler, flag profile) and reused by every source whose own leading includes cover that set.
+    The profile is the argv without the source, the output, -s and -mllvm options, since those do
+    not affect parsing.
+    """
+
+    def __init__(self, pch_dir: str, min_share: float = 0.2):
+        self.pch_dir = Path(pch_dir)
+        self.min_share = min_share
+        self.headers: Tuple[str, ...] = ()
+        self._includes: Dict[Path, Optional[Tuple[str, ...]]] = {}
+        self._built: Dict[tuple, List[str]] = {}
+
+    def detect(self, sources: List[Path]):
+        for src_file in sources:
+            self._includes[src_file] = leading_includes(src_file)
+        counts = Counter(frozenset(inc) for inc in self._includes.values() if inc)
+        if counts:
+            headers, count = counts.most_common(1)[0]
+            if count >= self.min_share * len(sources):
+                self.headers = tuple(sorted(headers))
+        print(f"PCH: {', '.join(self.headers) or 'no common include prefix'}")
+
+    def eligible(self, src_file: Path) -> bool:
+        if src_file not in self._includes:
+            self._includes[src_file] = leading_includes(src_file)
+        includes = self._includes[src_file]
+        return bool(self.headers) and includes is not None and set(self.headers) <= set(includes)
+
+    @staticmethod
+    def profile(cmd: List[str]) -> Tuple[str, ...]:
+        flags = []
+        skip_next = False
+        for arg in cmd[4:]:
+            if skip_next:
+                skip_next = False
+            elif arg == "-mllvm":
+                skip_next = True
+            elif arg != "-s":
+                flags.append(arg)
+        return tuple(flags)
+
+    def flags(self, compiler: str, cmd: List[str]) -> List[str]:
+        """Extra argv for using the PCH matching cmd, building it on first use. Empty if the build failed."""
+        profile = self.profile(cmd)
+        key = (compiler, profile)
+        if key not in self._built:
+            digest = hashlib.sha256("\0".join((compiler,) + profile + self.headers).encode()).hexdigest()[:16]
+            build_dir = self.pch_dir / f"{Path(compiler).name}-{digest}"
+            build_dir.mkdir(parents=True, exist_ok=True)
+            header = build_dir / "pch_common.h"
+            header.write_text("".join(f"#include <{h}>\n" for h in self.headers))
+            is_clang = "clang" in Path(compiler).name
+            pch_file = header.with_suffix(".h.pch" if is_clang else ".h.gch")
+            result = subprocess.run([compiler, *profile, "-x", "c++-header", str(header), "-o", str(pch_file)],
+                                    capture_output=True)
+            if result.returncode != 0:
+                logging.error(f"Failed to build PCH for {compiler} {profile}: {result.stderr.decode()}")
+                self._built[key] = []
+            elif is_clang:
+                self._built[key] = ["-include-pch", str(pch_file)]
+            else:
+                self._built[key] = ["-include", str(header), "-Winvalid-pch"]
+        return self._built[key]
+
+def generate_compiler_cmd(compiler: str, source_file: str, output_file: str, obfuscate: bool, rng=random) -> List[str]:
     """Generate compiler command based on the compiler type and obfuscation flag."""
     if not obfuscate:
         if compiler == 'clang++':
@@ -28,51 +283,51 @@ def generate_compiler_cmd(compiler: str, source_file: str, output_file: str, obf
             return ["g++", source_file, "-o", output_file]
     
     if compiler == 'clang++':
-        return generate_clang_cmd(source_file, output_file)
+        return generate_clang_cmd(source_file, output_file, rng)
     elif compiler == 'g++':
-        return generate_gcc_cmd(source_file, output_file)
+        return generate_gcc_cmd(source_file, output_file, rng)
     else:
         raise ValueError(f"Unsupported compiler: {compiler}")
 
-def generate_clang_cmd(source_file: str, output_file: str) -> List[str]:
+def generate_clang_cmd(source_file: str, output_file: str, rng=random) -> List[str]:
     """Generate Clang++ compilation command with obfuscation options."""
     cmd = ["clang++", source_file, "-o", output_file]
     new_cmd = False
     
     options = config["clang_options"]
     
-    if random.choice([True, False]):
+    if rng.choice([True, False]):
         cmd.append("-s")
         new_cmd = True
 
     for option, params in options.items():
-        if random.choice([True, False]):
+        if rng.choice([True, False]):
             cmd.append("-mllvm")
             cmd.append(f'-{option}')
             new_cmd = True
             if params:
-                if random.choice([True, False]):
+                if rng.choice([True, False]):
                     for key, value in params.items():
                         cmd.append("-mllvm")
-                        cmd.append(f"-{option}_{key}={random.choice(value)}")
+                        cmd.append(f"-{option}_{key}={rng.choice(value)}")
 
     if not new_cmd:
         return ["clang++", source_file, "-o", output_file, "-s", "-mllvm", "-sub", "-mllvm", "-fla", "-mllvm", "-bcf"]
 
     return cmd
 
-def generate_gcc_cmd(source_file: str, output_file: str) -> List[str]:
+def generate_gcc_cmd(source_file: str, output_file: str, rng=random) -> List[str]:
     """Generate G++ compilation command with random optimization options."""
     cmd = ["g++", source_file, "-o", output_file]
     new_cmd = False
 
     # Randomly add -s (strip symbols)
-    if random.choice([True, False]):
+    if rng.choice([True, False]):
         cmd.append("-s")
         new_cmd = True
     
     # Randomly choose between -O2 and -O3, or neither
-    optimization = random.choice(["-O2", "-O3", None])
+    optimization = rng.choice(["-O2", "-O3", None])
     if optimization:
         cmd.append(optimization)
         new_cmd = True
@@ -82,29 +337,137 @@ def generate_gcc_cmd(source_file: str, output_file: str) -> List[str]:
     
     return cmd
 
-async def compile_file_async(compiler: str, src_file: Path, output_file: Path, semaphore: asyncio.Semaphore, pbar: tqdm, obfuscate: bool):
-    """Compile a single file asynchronously."""
-    async with semaphore:
-        cmd = generate_compiler_cmd(compiler, str(src_file), str(output_file), obfuscate)
+class CompileJob(NamedTuple):
+    compiler: str
+    src_file: Path
+    output_file: Path
+    cmd: List[str]
+    cost: int
+    manifest_entry: Optional[tuple]
+
+# relative cost of the OLLVM passes; the bogus control flow and flattening passes dominate
+PASS_COSTS = {"-fla": 4, "-bcf": 4, "-sobf": 2, "-split": 1, "-sub": 1}
+
+def estimate_cost(cmd: List[str]) -> int:
+    """Rough expected compile time of a command, used to start the longest jobs first."""
+    cost = 1
+    for arg in cmd:
+        cost += PASS_COSTS.get(arg, 0)
+        if arg.startswith("-bcf_loop="):
+            cost += 2 * int(arg.split("=")[1])
+        elif arg in ("-O2", "-O3"):
+            cost += 1
+    return cost
+
+def available_memory_gb() -> Optional[float]:
+    """MemAvailable from /proc/meminfo, or None where it cannot be read."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024 ** 2
+    except OSError:
+        pass
+    return None
+
+class CompileScheduler:
+    """Run compile jobs from a bounded queue with a concurrency that follows system load.
+
+    Up to max_workers workers pull jobs, but a worker only starts a job while the number of
+    running jobs is below allowed_workers(). That number shrinks when the 1-minute load average
+    exceeds the CPU count or when free memory would drop below min_free_memory_gb.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, min_free_memory_gb: float = 2.0,
+                 job_memory_gb: float = 0.5, job_timeout: Optional[float] = None, queue_size: int = 256,
+                 poll_interval: float = 0.5):
+        self.cpu_count = os.cpu_count() or 1
+        self.max_workers = max_workers or self.cpu_count
+        self.min_free_memory_gb = min_free_memory_gb
+        self.job_memory_gb = job_memory_gb
+        self.job_timeout = job_timeout
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.running = 0
+
+    def allowed_workers(self) -> int:
+        allowed = self.max_workers
         try:
-            logging.info(f'Starting compilation of {src_file} with {compiler}: {cmd}')
-            process = await asyncio.create_subprocess_exec(
-                *cmd, 
-                stdout=asyncio.subprocess.PIPE, 
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                error_message = stderr.decode() if stderr else "Unknown error"
-                logging.error(f'Error compiling {src_file}, {compiler}')   
-            else:
-                logging.info(f'Successfully compiled {src_file}')
-        except Exception as e:
-            logging.error(f'Unexpected error compiling {src_file}: {str(e)}')
-        finally:
-            pbar.update(1)
-            logging.info(f'Completed compilation attempt of {src_file} with {compiler}')
+            overload = os.getloadavg()[0] - self.cpu_count
+            if overload > 0:
+                allowed -= int(overload)
+        except (AttributeError, OSError):  # no load average on Windows
+            pass
+        free_gb = available_memory_gb()
+        if free_gb is not None:
+            allowed = min(allowed, self.running + int((free_gb - self.min_free_memory_gb) / self.job_memory_gb))
+        return max(1, allowed)
+
+    async def _worker(self, queue: asyncio.Queue, run_job, results: Dict[int, bool]):
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            index, job = item
+            while self.running > 0 and self.running >= self.allowed_workers():
+                await asyncio.sleep(self.poll_interval)
+            self.running += 1
+            try:
+                results[index] = await run_job(job, self.job_timeout)
+            finally:
+                self.running -= 1
+                queue.task_done()
+
+    async def run(self, jobs: List[CompileJob], run_job) -> List[bool]:
+        """Run jobs longest-expected-first and return their results in the original order."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        results: Dict[int, bool] = {}
+        workers = [asyncio.create_task(self._worker(queue, run_job, results)) for _ in range(self.max_workers)]
+        for index in sorted(range(len(jobs)), key=lambda i: jobs[i].cost, reverse=True):
+            await queue.put((index, jobs[index]))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        return [results[i] for i in range(len(jobs))]
+
+async def compile_file_async(job: CompileJob, timeout: Optional[float], pbar: tqdm, cache: Optional[BuildCache] = None) -> bool:
+    """Compile a single file asynchronously. Returns whether it succeeded."""
+    compiler, src_file, output_file, cmd = job.compiler, job.src_file, job.output_file, job.cmd
+    key = cache.key(compiler, cmd, src_file, output_file) if cache else None
+    if cache and cache.fetch(key, output_file):
+        pbar.update(1)
+        return True
+    success = False
+    try:
+        logging.info(f'Starting compilation of {src_file} with {compiler}: {cmd}')
+        process = await asyncio.create_subprocess_exec(
+            *cmd, 
+            stdout=asyncio.subprocess.PIPE, 
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            logging.error(f'Timed out after {timeout}s compiling {src_file}, {compiler}: {cmd}')
+            return False
+        
+        if process.returncode != 0:
+            error_message = stderr.decode() if stderr else "Unknown error"
+            logging.error(f'Error compiling {src_file}, {compiler}')   
+        else:
+            logging.info(f'Successfully compiled {src_file}')
+            success = True
+            if cache:
+                cache.store(key, output_file)
+    except Exception as e:
+        logging.error(f'Unexpected error compiling {src_file}: {str(e)}')
+    finally:
+        pbar.update(1)
+        logging.info(f'Completed compilation attempt of {src_file} with {compiler}')
+    return success
 
 async def run_compilation(config, obfuscate: bool):
     """Run the compilation process with given configuration and obfuscation flag."""
@@ -115,10 +478,28 @@ async def run_compilation(config, obfuscate: bool):
     cpp_files = list(SRC_DIR.rglob('*.cpp'))
     total_compilations = len(cpp_files) * len(COMPILERS)
     
-    semaphore = asyncio.Semaphore(os.cpu_count() or 1)
+    scheduler = CompileScheduler(**config.get("scheduler", {}))
+
+    cache = None
+    if config.get("build_cache"):
+        cache = BuildCache(config["build_cache"]["dir"], config["build_cache"]["max_size_gb"])
+        for compiler_path in COMPILERS.values():
+            cache.compiler_version(compiler_path)
+
+    pch = None
+    if config.get("pch", {}).get("enabled"):
+        pch = PrecompiledHeaders(config["pch"]["dir"], config["pch"].get("min_share", 0.2))
+        pch.detect(cpp_files)
+
+    manifest = None
+    if config.get("manifest"):
+        manifest = BuildManifest(config["manifest"]["path"], config["manifest"]["seed"])
+    mode = 'obfuscated' if obfuscate else 'normal'
+    up_to_date = 0
     
     with tqdm(total=total_compilations, desc=f"Compiling files ({'obfuscated' if obfuscate else 'normal'})") as pbar:
-        tasks = []
+        jobs = []
+        output_dirs = set()
         for src_file in cpp_files:
             rel_path = src_file.relative_to(SRC_DIR)
             parts = rel_path.parts
@@ -127,15 +508,70 @@ async def run_compilation(config, obfuscate: bool):
                 
                 for compiler_name, compiler_path in COMPILERS.items():
                     output_dir = COMPILED_DIR / ('obfuscated' if obfuscate else 'normal') / compiler_name / username / year
-                    output_dir.mkdir(parents=True, exist_ok=True)
-                    
                     output_file = output_dir / (src_file.stem + ".exe")
-                    task = asyncio.create_task(compile_file_async(compiler_path, src_file, output_file, semaphore, pbar, obfuscate))
-                    tasks.append(task)
+                    rng = random
+                    manifest_entry = None
+                    if manifest:
+                        source = rel_path.as_posix()
+                        seed = manifest.seed(mode, source, compiler_name)
+                        rng = random.Random(seed)
+                    cmd = generate_compiler_cmd(compiler_path, str(src_file), str(output_file), obfuscate, rng)
+                    if manifest:
+                        source_sha256 = hashlib.sha256(src_file.read_bytes()).hexdigest()
+                        argv = placeholder_argv(cmd, src_file, output_file)
+                        if manifest.is_current(mode, source, compiler_name, seed, source_sha256, argv, output_file):
+                            up_to_date += 1
+                            pbar.update(1)
+                            continue
+                        manifest_entry = (source, compiler_name, seed, source_sha256, argv)
+                    output_dirs.add(output_dir)
+                    if pch and pch.eligible(src_file):
+                        cmd += pch.flags(compiler_path, cmd)
+                    jobs.append(CompileJob(compiler_path, src_file, output_file, cmd, estimate_cost(cmd), manifest_entry))
             else:
                 logging.warning(f"Skipping file with unexpected path structure: {src_file}")
-        
-        await asyncio.gather(*tasks)
+
+        for output_dir in output_dirs:
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+        results = await scheduler.run(jobs, lambda job, timeout: compile_file_async(job, timeout, pbar, cache))
+
+    if manifest:
+        for job, success in zip(jobs, results):
+            manifest.record(mode, *job.manifest_entry, job.output_file, success)
+        manifest.save()
+        print(f"Manifest: {up_to_date} up to date, {len(jobs)} rebuilt ({mode})")
+
+    if cache:
+        cache.evict()
+        cache.report()
+
+def benchmark_pch(config, sample_size: int):
+    """Compile a sample of PCH-eligible sources with and without the PCH and report the per-file time."""
+    cpp_files = sorted(Path(config["src_dir_nor"]).rglob('*.cpp'))
+    with tempfile.TemporaryDirectory() as tmp:
+        pch = PrecompiledHeaders(os.path.join(tmp, "pch"), config.get("pch", {}).get("min_share", 0.2))
+        pch.detect(cpp_files)
+        sample = [f for f in cpp_files if pch.eligible(f)][:sample_size]
+        if not sample:
+            print("No sources share a common include prefix.")
+            return
+        output_file = os.path.join(tmp, "out.exe")
+        for compiler_name, compiler_path in config["compilers"].items():
+            # build the PCH up front so its one-off cost is not counted per file
+            pch.flags(compiler_path, generate_compiler_cmd(compiler_path, str(sample[0]), output_file, False))
+            timings = {}
+            for label, use_pch in (("without PCH", False), ("with PCH", True)):
+                start = time.perf_counter()
+                for src_file in sample:
+                    cmd = generate_compiler_cmd(compiler_path, str(src_file), output_file, False)
+                    if use_pch:
+                        cmd += pch.flags(compiler_path, cmd)
+                    subprocess.run(cmd, capture_output=True)
+                timings[label] = (time.perf_counter() - start) / len(sample)
+            reduction = 1 - timings["with PCH"] / timings["without PCH"]
+            print(f"{compiler_name}: {timings['without PCH'] * 1000:.0f} ms/file without PCH, "
+                  f"{timings['with PCH'] * 1000:.0f} ms/file with PCH ({reduction:.0%} less, {len(sample)} files)")
 
 async def main():
     """Main function to run compilation processes."""
@@ -146,5 +582,13 @@ async def main():
     await run_compilation(config, obfuscate=True)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the GCJ corpus.")
+    parser.add_argument("--bench-pch", type=int, metavar="N",
+                        help="compare per-file compile time with and without PCH on N sources, then exit")
+    args = parser.parse_args()
+
     config = load_config("config.yaml")
-    asyncio.run(main())
\ No newline at end of file
+    if args.bench_pch:
+        benchmark_pch(config, args.bench_pch)
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -1,14 +1,19 @@
 import asyncio
 import os
 from .compiler_interface import CompilerInterface
+from .pipeline import Pipeline, Stage
 
 class BaseCompiler(CompilerInterface):
+    name = ''
+    suffix = ''
+
     def __init__(self, config):
         self.base_path = config["base_path"]
         self.output_base_path = config["output_base_path"]
+        self.max_concurrency = config.get("max_concurrency") or os.cpu_count() or 1
 
-    async def compile_files(self):
-        tasks = []
+    def iter_sources(self):
+        """Yield (file_path, user, year) for every .cpp file under base_path/<user>/<year>/"""
         for user in os.listdir(self.base_path):
             user_path = os.path.join(self.base_path, user)
             if os.path.isdir(user_path):
@@ -19,9 +24,31 @@ class BaseCompiler(CompilerInterface):
                             file_path = os.path.join(year_path, file)
                             file_base, file_ext = os.path.splitext(file_path)
                             if file_ext == '.cpp':
-                                tasks.append(self.compile_file(file_path, user, year))
-        
-        await asyncio.gather(*tasks)
+                                yield file_path, user, year
+
+    async def compile_files(self):
+        async def compile_item(item):
+            return await self.compile_file(*item)
 
-    def compile_file(self, file_path, user, year):
+        stage = Stage(self.name, compile_item, workers=self.max_concurrency)
+        await Pipeline([stage]).run(self.iter_sources())
+
+    def build_cmd(self, file_path, output_file_path):
         raise NotImplementedError("Subclasses must implement this method.")
+
+    async def compile_file(self, file_path, user, year):
+        """Compile one source and return the output path, or None if compilation failed."""
+        output_dir = os.path.join(self.output_base_path, self.name, user, year)
+        os.makedirs(output_dir, exist_ok=True)
+
+        output_file_path = os.path.join(output_dir, os.path.splitext(os.path.basename(file_path))[0] + f'{self.suffix}.exe')
+        try:
+            proc = await asyncio.create_subprocess_exec(*self.build_cmd(file_path, output_file_path))
+            await proc.communicate()
+            if proc.returncode == 0:
+                print(f'Successfully compiled {file_path} with {self.name}')
+                return output_file_path
+            print(f'Failed to compile {file_path} with {self.name}')
+        except Exception as e:
+            print(f'Failed to compile {file_path} with {self.name}: {e}')
+        return None
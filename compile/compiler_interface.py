@@ -8,3 +8,7 @@ class CompilerInterface(ABC):
     @abstractmethod
     def compile_file(self, file_path, user, year):
         pass
+
+    @abstractmethod
+    def build_cmd(self, file_path, output_file_path):
+        pass
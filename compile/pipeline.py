@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+
+class Stage:
+    """One step of a Pipeline.
+
+    process is a coroutine function taking an item and returning the item for the next stage, or
+    None to drop it. Each stage runs `workers` copies of process and reads from its own bounded
+    queue, so a slow stage blocks the stages before it instead of letting work pile up.
+    """
+
+    def __init__(self, name, process, workers=1, queue_size=None):
+        self.name = name
+        self.process = process
+        self.workers = workers
+        self.queue_size = queue_size
+        self.processed = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+
+
+class Pipeline:
+    """Stream items through a list of stages, each item moving on as soon as its stage finishes."""
+
+    def __init__(self, stages, queue_size=64):
+        self.stages = stages
+        self.queue_size = queue_size
+
+    async def _worker(self, stage, inbox, outbox):
+        while True:
+            item = await inbox.get()
+            if item is None:
+                return
+            start = time.perf_counter()
+            try:
+                result = await stage.process(item)
+            except Exception as e:
+                print(f'{stage.name} failed on {item}: {e}')
+                result = None
+            stage.busy_time += time.perf_counter() - start
+            if result is None:
+                stage.dropped += 1
+                continue
+            stage.processed += 1
+            if outbox is not None:
+                await outbox.put(result)
+
+    async def _run_stage(self, stage, inbox, outbox, next_stage):
+        await asyncio.gather(*[self._worker(stage, inbox, outbox) for _ in range(stage.workers)])
+        if outbox is not None:
+            for _ in range(next_stage.workers):
+                await outbox.put(None)
+
+    async def run(self, items):
+        """Feed items (any iterable) through the stages and wait for the last one to finish."""
+        queues = [asyncio.Queue(maxsize=stage.queue_size or self.queue_size) for stage in self.stages]
+        runners = []
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(self.stages) else None
+            next_stage = self.stages[i + 1] if outbox is not None else None
+            runners.append(asyncio.create_task(self._run_stage(stage, queues[i], outbox, next_stage)))
+
+        for item in items:
+            await queues[0].put(item)
+        for _ in range(self.stages[0].workers):
+            await queues[0].put(None)
+        await asyncio.gather(*runners)
+
+        for stage in self.stages:
+            print(f'{stage.name}: {stage.processed} done, {stage.dropped} dropped, {stage.busy_time:.1f}s busy')
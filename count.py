@@ -1,5 +1,9 @@
 import os
 import math
+import sqlite3
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
 
 def count_submissions_with_stats(submissions_dir):
     user_files = {}  # Dictionary to store the number of files per user
@@ -40,12 +44,157 @@ def count_submissions_with_stats(submissions_dir):
     
     return user_count, total_files, mean, std_dev
 
-# Path to the folder
-folder_path = '../../res/compiled/normal/clang'
+class CorpusInventory:
+    """Per obfuscation/compiler/user/year file counts and byte sizes of the compiled corpus.
 
-# Call the function and display results
-username_count, file_count, mean, std_dev = count_submissions_with_stats(folder_path)
-print(f"Total unique usernames: {username_count}")
-print(f"Total number of files: {file_count}")
-print(f"Average files per user: {mean:.2f}")
-print(f"Standard deviation of files per user: {std_dev:.2f}")
+    The inventory lives in SQLite next to the corpus. A refresh only rescans year directories whose
+    mtime changed since the last scan, which covers files being added, removed or renamed.
+    """
+
+    def __init__(self, compiled_dir, db_path=None, max_workers=None):
+        self.compiled_dir = compiled_dir
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self.conn = sqlite3.connect(db_path or os.path.join(compiled_dir, 'inventory.db'))
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS inventory
+                             (obfuscation TEXT NOT NULL,
+                              compiler TEXT NOT NULL,
+                              user TEXT NOT NULL,
+                              year TEXT NOT NULL,
+                              files INTEGER NOT NULL,
+                              bytes INTEGER NOT NULL,
+                              mtime_ns INTEGER NOT NULL,
+                              PRIMARY KEY (obfuscation, compiler, user, year))''')
+        self.conn.commit()
+
+    @staticmethod
+    def _subdirs(path):
+        with os.scandir(path) as it:
+            return [entry for entry in it if entry.is_dir()]
+
+    def _scan_user(self, obfuscation, compiler, user_entry, known):
+        rows, rescanned = [], 0
+        for year_entry in self._subdirs(user_entry.path):
+            key = (obfuscation, compiler, user_entry.name, year_entry.name)
+            mtime_ns = year_entry.stat().st_mtime_ns
+            cached = known.get(key)
+            if cached is not None and cached[2] == mtime_ns:
+                rows.append(key + cached)
+                continue
+            files, size = 0, 0
+            with os.scandir(year_entry.path) as it:
+                for entry in it:
+                    if entry.is_file():
+                        files += 1
+                        size += entry.stat().st_size
+            rows.append(key + (files, size, mtime_ns))
+            rescanned += 1
+        return rows, rescanned
+
+    def refresh(self):
+        """Bring the inventory up to date and return the number of rescanned year directories."""
+        known = {row[:4]: row[4:] for row in self.conn.execute('SELECT * FROM inventory')}
+        jobs = []
+        for obfuscation_entry in self._subdirs(self.compiled_dir):
+            for compiler_entry in self._subdirs(obfuscation_entry.path):
+                for user_entry in self._subdirs(compiler_entry.path):
+                    jobs.append((obfuscation_entry.name, compiler_entry.name, user_entry, known))
+
+        rows, rescanned = [], 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for user_rows, user_rescanned in executor.map(lambda job: self._scan_user(*job), jobs):
+                rows.extend(user_rows)
+                rescanned += user_rescanned
+
+        with self.conn:
+            self.conn.execute('DELETE FROM inventory')
+            self.conn.executemany('INSERT INTO inventory VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        return rescanned
+
+    def _where(self, obfuscation=None, compiler=None):
+        clauses, params = [], []
+        if obfuscation:
+            clauses.append('obfuscation = ?')
+            params.append(obfuscation)
+        if compiler:
+            clauses.append('compiler = ?')
+            params.append(compiler)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def files_per_user(self, obfuscation=None, compiler=None):
+        where, params = self._where(obfuscation, compiler)
+        return dict(self.conn.execute(f'SELECT user, SUM(files) FROM inventory{where} GROUP BY user', params))
+
+    def group_totals(self, group_by, obfuscation=None, compiler=None):
+        """Return [(group, users, files, bytes)] grouped by obfuscation, compiler, user or year"""
+        if group_by not in ('obfuscation', 'compiler', 'user', 'year'):
+            raise ValueError(f"Cannot group by {group_by}")
+        where, params = self._where(obfuscation, compiler)
+        return list(self.conn.execute(f'SELECT {group_by}, COUNT(DISTINCT user), SUM(files), SUM(bytes) '
+                                      f'FROM inventory{where} GROUP BY {group_by} ORDER BY {group_by}', params))
+
+    def close(self):
+        self.conn.close()
+
+def print_distribution(user_files):
+    counts = sorted(user_files.values())
+    if not counts:
+        raise ValueError("No users detected. Please check the directory structure.")
+    # inclusive: the deciles stay within [min, max] instead of being extrapolated past the data
+    deciles = statistics.quantiles(counts, n=10, method='inclusive') if len(counts) > 1 else [counts[0]] * 9
+    print(f"Total unique usernames: {len(counts)}")
+    print(f"Total number of files: {sum(counts)}")
+    print(f"Average files per user: {statistics.mean(counts):.2f}")
+    print(f"Standard deviation of files per user: {statistics.pstdev(counts):.2f}")
+    print(f"Median / min / max files per user: {statistics.median(counts)} / {counts[0]} / {counts[-1]}")
+    print(f"10th / 90th percentile: {deciles[0]:.1f} / {deciles[-1]:.1f}")
+
+def stats(args):
+    inventory = CorpusInventory(args.root, args.db, args.workers)
+    if not args.no_refresh:
+        rescanned = inventory.refresh()
+        print(f"Inventory refreshed ({rescanned} directories rescanned)")
+    user_files = inventory.files_per_user(args.obfuscation, args.compiler)
+    if not user_files:
+        filters = ', '.join(f"{name}={value}" for name, value in
+                            (('obfuscation', args.obfuscation), ('compiler', args.compiler)) if value)
+        print(f"No files found in the inventory{' for ' + filters if filters else ''}.")
+        inventory.close()
+        return
+    print_distribution(user_files)
+    if args.group_by:
+        print(f"\n{args.group_by:<20} {'users':>8} {'files':>10} {'MB':>10}")
+        for group, users, files, size in inventory.group_totals(args.group_by, args.obfuscation, args.compiler):
+            print(f"{group:<20} {users:>8} {files:>10} {size / 1024 ** 2:>10.1f}")
+    inventory.close()
+
+def walk(args):
+    username_count, file_count, mean, std_dev = count_submissions_with_stats(args.path)
+    print(f"Total unique usernames: {username_count}")
+    print(f"Total number of files: {file_count}")
+    print(f"Average files per user: {mean:.2f}")
+    print(f"Standard deviation of files per user: {std_dev:.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count submissions in the compiled corpus.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    walk_parser = subparsers.add_parser('walk', help="count one <user>/ tree with os.walk")
+    # Path to the folder
+    walk_parser.add_argument('--path', default='../../res/compiled/normal/clang')
+    walk_parser.set_defaults(func=walk)
+
+    stats_parser = subparsers.add_parser('stats', help="query the cached corpus inventory")
+    stats_parser.add_argument('--root', default='../../res/compiled',
+                              help="compiled corpus laid out as <obfuscation>/<compiler>/<user>/<year>/")
+    stats_parser.add_argument('--db', help="inventory database (default: <root>/inventory.db)")
+    stats_parser.add_argument('--obfuscation', help="only count this obfuscation, e.g. normal")
+    stats_parser.add_argument('--compiler', help="only count this compiler, e.g. clang")
+    stats_parser.add_argument('--group-by', choices=['obfuscation', 'compiler', 'user', 'year'])
+    stats_parser.add_argument('--workers', type=int, help="threads used to scan user directories")
+    stats_parser.add_argument('--no-refresh', action='store_true', help="answer from the inventory without rescanning")
+    stats_parser.set_defaults(func=stats)
+
+    args = parser.parse_args()
+    if args.command is None:
+        args = parser.parse_args(['walk'])
+    args.func(args)
@@ -18,6 +18,8 @@ sys.path.append(proj_dir)
 from config import config
 from tools import utils
 from learner.basic_DNN import BasicDNNModel, feature_type_scope_dict, graph, INFO, DNN_HP
+from learner.feature_extractor import get_normalizer
+from learner.dataset_store import get_dataset
 from attacker.methods.pgd_adam import PGDAdam
 from attacker.methods.pgdl1 import PGDl1
 from attacker.methods.pgd import PGD
@@ -82,7 +84,7 @@ class AdversarialTrainingDNN(BasicDNNModel):
 
         # initialization
         if self.feature_tp == feature_type_scope_dict.keys()[0]:
-            self.normalizer = utils.read_pickle(config.get('feature.' + self.feature_tp, 'normalizer'))
+            self.normalizer = get_normalizer(self.feature_tp)
         else:
             raise ValueError("Feature type is incompatible.")
         input_dim = len(utils.read_pickle(config.get('feature.' + self.feature_tp, 'vocabulary')))
@@ -264,8 +266,9 @@ class AdversarialTrainingDNN(BasicDNNModel):
     def train(self, trainX=None, trainy=None, valX=None, valy=None):
         """train dnn"""
         if trainX is None or trainy is None or valX is None or valy is None:
-            trainX, valX, _ = utils.read_joblib(config.get('feature.' + self.feature_tp, 'dataX'))
-            trainy, valy, _ = utils.read_joblib(config.get('feature.' + self.feature_tp, 'datay'))
+            dataset = get_dataset(self.feature_tp)
+            trainX, trainy = dataset.load('train')
+            valX, valy = dataset.load('val')
 
         train_input = utils.DataProducer(trainX, trainy,self.hp_params.batch_size, n_epochs=self.hp_params.n_epochs)
         val_input = utils.DataProducer(valX, valy, self.hp_params.batch_size, name='val')
@@ -19,6 +19,8 @@ sys.path.append(proj_dir)
 from config import config
 from tools import utils
 from learner.basic_DNN import BasicDNNModel, feature_type_scope_dict, graph, INFO, DNN_HP
+from learner.feature_extractor import get_normalizer
+from learner.dataset_store import get_dataset
 from defender.at import MAXIMIZER_PARAM_DICT, MAXIMIZER_METHOD_DICT, ADV_TRAIN_HP
 from attacker.feature_reverser import obfFeatureReverse
 
@@ -69,7 +71,7 @@ class AdversarialTrainingDNNMax(BasicDNNModel):
 
         # initialization
         if self.feature_tp == feature_type_scope_dict.keys()[0]:
-            self.normalizer = utils.read_pickle(config.get('feature.' + self.feature_tp, 'normalizer'))
+            self.normalizer = get_normalizer(self.feature_tp)
         else:
             raise ValueError("Feature type is incompatible.")
 
@@ -281,8 +283,9 @@ class AdversarialTrainingDNNMax(BasicDNNModel):
     def train(self, trainX=None, trainy=None, valX=None, valy=None):
         """train dnn"""
         if trainX is None or trainy is None or valX is None or valy is None:
-            trainX, valX, _ = utils.read_joblib(config.get('feature.' + self.feature_tp, 'dataX'))
-            trainy, valy, _ = utils.read_joblib(config.get('feature.' + self.feature_tp, 'datay'))
+            dataset = get_dataset(self.feature_tp)
+            trainX, trainy = dataset.load('train')
+            valX, valy = dataset.load('val')
 
         train_input = utils.DataProducer(trainX, trainy, self.hp_params.batch_size, n_epochs=self.hp_params.n_epochs)
         val_input = utils.DataProducer(valX, valy, self.hp_params.batch_size * 4, name='val')
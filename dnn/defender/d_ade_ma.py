@@ -18,7 +18,8 @@ sys.path.append(proj_dir)
 
 from config import config
 from tools import utils
-from learner.feature_extractor import get_droid_feature, FeatureMapping, feature_type_scope_dict
+from learner.feature_extractor import get_droid_feature, FeatureMapping, feature_type_scope_dict, get_normalizer
+from learner.dataset_store import get_dataset
 from learner.basic_DNN import BasicDNNModel, DNN_HP, INFO
 from attacker.feature_reverser import obfFeatureReverse
 from defender.at import MAXIMIZER_PARAM_DICT, MAXIMIZER_METHOD_DICT
@@ -79,7 +80,7 @@ class DAdversarialDeepEnsembleMax(BasicDNNModel):
 
         # initialization
         if self.clf_info.feature_tp == feature_type_scope_dict.keys()[0]:
-            self.normalizer = utils.read_pickle(config.get('feature.' + self.clf_info.feature_tp, 'normalizer'))
+            self.normalizer = get_normalizer(self.clf_info.feature_tp)
         else:
             raise ValueError("Feature type is incompatible.")
         input_dim = len(utils.read_pickle(config.get('feature.' + self.clf_info.feature_tp, 'vocabulary')))
@@ -383,8 +384,9 @@ class DAdversarialDeepEnsembleMax(BasicDNNModel):
     def train(self, trainX = None, trainy = None, valX = None, valy = None):
         """train deep ensemble"""
         if trainX is None or trainy is None or valX is None or valy is None:
-            trainX, valX, _ = utils.read_joblib(config.get('feature.' + self.feature_tp, 'dataX'))
-            trainy, valy, _ = utils.read_joblib(config.get('feature.' + self.feature_tp, 'datay'))
+            dataset = get_dataset(self.feature_tp)
+            trainX, trainy = dataset.load('train')
+            valX, valy = dataset.load('val')
 
         train_input = utils.DataProducer(trainX, trainy,self.hp_params.batch_size, n_epochs=self.hp_params.n_epochs)
         val_input = utils.DataProducer(valX, valy, self.hp_params.batch_size*20, name='val')
@@ -15,6 +15,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 from learner.classification import *
 from tools import utils
 from learner.feature_extractor import get_droid_feature, FeatureMapping, feature_type_scope_dict
+from learner.dataset_store import DatasetStore, get_dataset, has_dataset
 from config import config, logging
 
 logger = logging.getLogger("learning.basic_dnn")
@@ -24,6 +25,8 @@ INFO = {
     'feature_type': list(feature_type_scope_dict.keys())[0],  # 'obf',
     'feature_mapping_type': config.get('feature.obf', 'feature_mp'),
     'use_interdependent_features': False,
+    'use_sparse_features': False,  # keep feature vectors in CSR and scale them per mini-batch
+    'feature_ranking': 'frequency',  # feature selection: 'frequency', 'chi2' or 'mutual_info'
     'learning_algorithm': 'DNN'
 }
 
@@ -189,8 +192,7 @@ class BasicDNNModel(Classifier):
         self.mal_dir = os.path.join(self.dataset_dir, config.get('dataset', 'malware_dir_name'))
         self.ben_dir = os.path.join(self.dataset_dir, config.get('dataset', 'benware_dir_name'))
 
-        if not (os.path.exists(config.get('feature.' + self.feature_tp, 'dataX')) and
-                os.path.exists(config.get('feature.' + self.feature_tp, 'datay')) and
+        if not (has_dataset(self.feature_tp) and
                 os.path.exists(config.get('feature.' + self.feature_tp, 'vocabulary')) and
                 os.path.exists(config.get('feature.' + self.feature_tp, 'normalizer')) and
                 os.path.exists(config.get('dataset', 'name_list'))):
@@ -244,34 +246,38 @@ class BasicDNNModel(Classifier):
 
             # select frequent features
             vocab_selected, vocab_info_dict_selcted = \
-                feature_mapping.select_feature(train_features, train_y, vocab, vocab_info_dict, dim=10000)
+                feature_mapping.select_feature(train_features, train_y, vocab, vocab_info_dict, dim=10000,
+                                               ranking=self.info_dict.get('feature_ranking', 'frequency'))
             MSG = "After feature selection, the feature number is {} vs. {}".format(len(vocab_selected), len(vocab))
             logger.info(msg=MSG)
 
+            sparse = self.info_dict.get('use_sparse_features', False)
             if self.feature_mp == 'count':
                 training_feature_vectors = \
-                    feature_mapping.count_feature_mapping_normalized(vocab_selected, train_features, status='train')
+                    feature_mapping.count_feature_mapping_normalized(vocab_selected, train_features, status='train',
+                                                                     sparse=sparse)
                 val_feature_vectors = \
-                    feature_mapping.count_feature_mapping_normalized(vocab_selected, val_features)
+                    feature_mapping.count_feature_mapping_normalized(vocab_selected, val_features, sparse=sparse)
                 test_feature_vectors = \
-                    feature_mapping.count_feature_mapping_normalized(vocab_selected, test_features)
+                    feature_mapping.count_feature_mapping_normalized(vocab_selected, test_features, sparse=sparse)
             elif self.feature_mp == 'binary':
                 training_feature_vectors = \
-                    feature_mapping.binary_feature_mapping_normalized(vocab_selected, train_features, status='train')
+                    feature_mapping.binary_feature_mapping_normalized(vocab_selected, train_features, status='train',
+                                                                      sparse=sparse)
                 val_feature_vectors = \
-                    feature_mapping.binary_feature_mapping_normalized(vocab_selected, val_features)
+                    feature_mapping.binary_feature_mapping_normalized(vocab_selected, val_features, sparse=sparse)
                 test_feature_vectors = \
-                    feature_mapping.binary_feature_mapping_normalized(vocab_selected, test_features)
+                    feature_mapping.binary_feature_mapping_normalized(vocab_selected, test_features, sparse=sparse)
             else:
                 raise ValueError("Not supported")
 
             # save features and feature representations
             utils.dump_pickle(vocab_selected, config.get('feature.' + self.feature_tp, 'vocabulary'))
             utils.dump_pickle(vocab_info_dict_selcted, config.get('feature.' + self.feature_tp, 'vocab_info'))
-            utils.dump_joblib([training_feature_vectors, val_feature_vectors, test_feature_vectors],
-                              config.get('feature.' + self.feature_tp, 'dataX'))
-            utils.dump_joblib([train_y, val_y, test_y],
-                              config.get('feature.' + self.feature_tp, 'datay'))
+            dataset = DatasetStore(self.feature_tp)
+            dataset.save('train', training_feature_vectors, train_y, train_name_list)
+            dataset.save('val', val_feature_vectors, val_y, val_name_list)
+            dataset.save('test', test_feature_vectors, test_y, test_name_list)
 
             utils.write_whole_file('\n'.join(train_name_list + val_name_list + test_name_list),
                                    config.get('dataset', 'name_list'))
@@ -397,8 +403,9 @@ class BasicDNNModel(Classifier):
         """train dnn"""
         if trainX is None or trainy is None or valX is None or valy is None:
             # load training dataset and validation dataset
-            trainX, valX, _ = utils.read_joblib(config.get('feature.' + self.feature_tp, 'dataX'))
-            trainy, valy, _ = utils.read_joblib(config.get('feature.' + self.feature_tp, 'datay'))
+            dataset = get_dataset(self.feature_tp)
+            trainX, trainy = dataset.load('train')
+            valX, valy = dataset.load('val')
 
         train_input = utils.DataProducer(trainX, trainy, self.hp_params.batch_size, n_epochs=self.hp_params.n_epochs)
         val_input = utils.DataProducer(valX, valy, self.hp_params.batch_size, name='val')
@@ -475,8 +482,7 @@ class BasicDNNModel(Classifier):
     def test_rpst(self, testX=None, testy=None, is_single_class=False):
         self.mode = 'test'
         if testX is None and testy is None:
-            _, _, testX = utils.read_joblib(config.get('feature.' + self.feature_tp, 'dataX'))
-            _, _, testy = utils.read_joblib(config.get('feature.' + self.feature_tp, 'datay'))
+            testX, testy = get_dataset(self.feature_tp).load('test')
 
         if len(testX) == 0:
             print("No test data.")
@@ -0,0 +1,55 @@
+"""
+benchmark FeatureMapping.count_feature_mapping against the per-sample Counter loop it replaced
+usage: python bench_feature_mapping.py [vocabulary_size ...]
+"""
+import os
+import sys
+import collections
+import random
+from timeit import default_timer
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from learner.feature_extractor import FeatureMapping
+
+
+def count_feature_mapping_loop(vocabulary, features):
+    """the previous implementation: one Counter per sample and a pass over the whole vocabulary per sample"""
+    feature_vectors = []
+    for f in features:
+        feature_counter = collections.Counter(f)
+        feature_value = [feature_counter.get(v) if feature_counter.get(v) is not None else 0 for v in vocabulary]
+        feature_vectors.append(feature_value)
+    return np.array(feature_vectors).astype(np.float32)
+
+
+def synthetic_features(vocab_size, n_samples=2000, mean_tokens=300, seed=0):
+    """token lists with a Zipf-like token distribution; about 10% of the tokens fall outside the vocabulary"""
+    rnd = random.Random(seed)
+    weights = [1. / (rank + 1) for rank in range(int(vocab_size * 1.1))]
+    tokens = ['token_{}'.format(rank) for rank in range(len(weights))]
+    return [rnd.choices(tokens, weights, k=rnd.randint(1, 2 * mean_tokens)) for _ in range(n_samples)]
+
+
+def _main():
+    vocab_sizes = [int(v) for v in sys.argv[1:]] or [1000, 10000, 50000]
+    for vocab_size in vocab_sizes:
+        vocabulary = ['token_{}'.format(rank) for rank in range(vocab_size)]
+        features = synthetic_features(vocab_size)
+
+        start = default_timer()
+        expected = count_feature_mapping_loop(vocabulary, features)
+        loop_time = default_timer() - start
+
+        start = default_timer()
+        actual = FeatureMapping('', 'obf').count_feature_mapping(vocabulary, features)
+        fast_time = default_timer() - start
+
+        assert np.array_equal(expected, actual), "vectorized count mapping differs from the loop"
+        print("vocabulary {:>6}: loop {:8.1f} samples/s, vectorized {:10.1f} samples/s ({:.0f}x)".format(
+            vocab_size, len(features) / loop_time, len(features) / fast_time, loop_time / fast_time))
+
+
+if __name__ == "__main__":
+    _main()
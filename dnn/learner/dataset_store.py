@@ -0,0 +1,163 @@
+"""On-disk dataset of the normalized feature vectors, one memory-mappable file per split"""
+import os
+import json
+
+import numpy as np
+import scipy.sparse as sp
+
+from tools import utils
+from config import config, logging
+from learner.feature_extractor import SparseRows, get_normalizer
+
+logger = logging.getLogger('learner.dataset_store')
+
+SPLITS = ('train', 'val', 'test')
+
+
+class DatasetStore(object):
+    """
+    the training, validation and test splits of a feature type. Split <s> is stored as
+        <s>_X.npy                                  dense float32 rows, or for sparse features (SparseRows) the CSR
+        <s>_X.data.npy, <s>_X.indices.npy, <s>_X.indptr.npy
+        <s>_y.npy                                  ground truth labels
+        <s>_names.txt                              one sample name per line
+    and registered in meta.json once all its files are in place. Feature matrices are opened with mmap_mode='r', so
+    opening a split takes constant time and indexing rows (e.g., a mini-batch, or the samples of one label) only reads
+    those rows from disk
+    """
+
+    def __init__(self, feature_type='obf', root=None):
+        self.feature_type = feature_type
+        if root is None:
+            root = dataset_dir(feature_type)
+        self.root = root
+        self.meta_file = os.path.join(root, 'meta.json')
+        self.meta = {}
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file) as f:
+                self.meta = json.load(f)
+
+    def _path(self, split, name):
+        return os.path.join(self.root, '{}_{}'.format(split, name))
+
+    def exists(self):
+        return all(split in self.meta for split in SPLITS)
+
+    def __len__(self):
+        return sum(info['rows'] for info in self.meta.values())
+
+    def save(self, split, X, y, names):
+        """
+        write one split
+        :param X: 2D numpy array, scipy.sparse matrix or SparseRows (its unscaled CSR matrix is stored)
+        :param y: labels, one per row of X
+        :param names: sample names, one per row of X
+        """
+        if split not in SPLITS:
+            raise ValueError("Split '{}' is not supported, use one of {}.".format(split, SPLITS))
+        if not (X.shape[0] == len(y) == len(names)):
+            raise ValueError("Inconsistent number of samples: {} vectors, {} labels and {} names.".format(
+                X.shape[0], len(y), len(names)))
+        if not os.path.exists(self.root):
+            os.makedirs(self.root)
+
+        is_sparse = isinstance(X, SparseRows) or sp.issparse(X)
+        if is_sparse:
+            X = X.X if isinstance(X, SparseRows) else X.tocsr()
+            for name in ('data', 'indices', 'indptr'):
+                self._save_npy(self._path(split, 'X.{}.npy'.format(name)), getattr(X, name))
+        else:
+            self._save_npy(self._path(split, 'X.npy'), np.asarray(X, dtype=np.float32))
+        self._save_npy(self._path(split, 'y.npy'), np.asarray(y))
+        utils.write_whole_file('\n'.join(names), self._path(split, 'names.txt'))
+
+        self.meta[split] = {'rows': int(X.shape[0]), 'dim': int(X.shape[1]), 'sparse': is_sparse}
+        with open(self.meta_file + '.tmp', 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(self.meta_file + '.tmp', self.meta_file)
+
+    @staticmethod
+    def _save_npy(path, arr):
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, arr)
+        os.replace(path + '.tmp', path)
+
+    def _info(self, split):
+        if split not in self.meta:
+            raise ValueError("No '{}' split in the dataset '{}'.".format(split, self.root))
+        return self.meta[split]
+
+    def X(self, split, mmap_mode='r'):
+        """
+        feature vectors of a split: a memory-mapped array, or SparseRows scaled by the feature type's normalizer
+        """
+        info = self._info(split)
+        if info['sparse']:
+            data, indices, indptr = [np.load(self._path(split, 'X.{}.npy'.format(name)), mmap_mode=mmap_mode)
+                                     for name in ('data', 'indices', 'indptr')]
+            X = sp.csr_matrix((data, indices, indptr), shape=(info['rows'], info['dim']), copy=False)
+            return SparseRows(X, get_normalizer(self.feature_type))
+        return np.load(self._path(split, 'X.npy'), mmap_mode=mmap_mode)
+
+    def y(self, split):
+        self._info(split)
+        return np.load(self._path(split, 'y.npy'))
+
+    def names(self, split):
+        self._info(split)
+        if self.meta[split]['rows'] == 0:
+            return []
+        with open(self._path(split, 'names.txt')) as f:
+            return f.read().split('\n')
+
+    def load(self, split):
+        """return the feature vectors and the labels of a split"""
+        return self.X(split), self.y(split)
+
+    def label_index(self, split, label):
+        """row indices of the samples with the given label, in order"""
+        return np.flatnonzero(self.y(split) == label)
+
+
+def dataset_dir(feature_type='obf'):
+    """the dataset directory of a feature type, by default next to its legacy 'dataX' file"""
+    section = 'feature.' + feature_type
+    if config.has_option(section, 'dataset'):
+        return config.get(section, 'dataset')
+    return config.get(section, 'dataX') + '_splits'
+
+
+def has_dataset(feature_type='obf'):
+    """whether a dataset of the feature type exists, in either format"""
+    return DatasetStore(feature_type).exists() or \
+        (os.path.exists(config.get('feature.' + feature_type, 'dataX')) and
+         os.path.exists(config.get('feature.' + feature_type, 'datay')))
+
+
+def get_dataset(feature_type='obf'):
+    """
+    open the dataset of a feature type; a dataset that only exists as the 'dataX'/'datay' joblib files written by
+    earlier versions is converted once
+    """
+    store = DatasetStore(feature_type)
+    if store.exists():
+        return store
+    dataX_path = config.get('feature.' + feature_type, 'dataX')
+    datay_path = config.get('feature.' + feature_type, 'datay')
+    if not (os.path.exists(dataX_path) and os.path.exists(datay_path)):
+        raise ValueError("No dataset of feature '{}' in '{}'.".format(feature_type, store.root))
+
+    logger.info("Convert '{}' and '{}' to the dataset '{}'.".format(dataX_path, datay_path, store.root))
+    dataX_list = utils.read_joblib(dataX_path)
+    datay_list = utils.read_joblib(datay_path)
+    name_list = []
+    if os.path.exists(config.get('dataset', 'name_list')):
+        with open(config.get('dataset', 'name_list')) as f:
+            name_list = f.read().split('\n')
+    if len(name_list) != sum(len(y) for y in datay_list):
+        name_list = [''] * sum(len(y) for y in datay_list)
+    start = 0
+    for split, X, y in zip(SPLITS, dataX_list, datay_list):
+        store.save(split, X, y, name_list[start: start + len(y)])
+        start += len(y)
+    return store
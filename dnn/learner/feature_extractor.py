@@ -1,9 +1,12 @@
 """Extract various types of features"""
 import os
 import collections
+import itertools
+import threading
 import warnings
 
 import numpy as np
+import scipy.sparse as sp
 from sklearn.preprocessing import MinMaxScaler
 from collections import defaultdict
 
@@ -14,15 +17,87 @@ from learner import obf
 
 logger = logging.getLogger('learner.feature')
 
+SPARSE_BLOCK_ROWS = 4096
+SELECT_BATCH_ROWS = 8192
+
+class SparseRows(object):
+    """
+    min-max normalized view of a sparse feature matrix: the scaled rows are dense (features that are absent in a row
+    are generally not zero after scaling), so they are only materialized for the rows being indexed, e.g., one
+    mini-batch of DataProducer at a time
+    """
+    def __init__(self, X, normalizer):
+        self.X = X.tocsr()
+        self.normalizer = normalizer
+
+    @property
+    def shape(self):
+        return self.X.shape
+
+    def __len__(self):
+        return self.X.shape[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            return self[index[0]][(slice(None),) + index[1:]]
+        if np.isscalar(index):
+            return self.normalizer.transform(self.X[index].toarray())[0]
+        return self.normalizer.transform(self.X[index].toarray())
+
+    def toarray(self):
+        return self[:]
+
+_normalizers = {}  # normalizer path -> (mtime_ns, normalizer), shared by the whole process
+_normalizers_lock = threading.Lock()
+
+def get_normalizer(feature_type = 'obf'):
+    """
+    return the fitted normalizer of the feature type, unpickled once per process and reloaded only when the file's
+    modification time changes
+    """
+    normalizer_path = config.get('feature.' + feature_type, 'normalizer')
+    if not os.path.exists(normalizer_path):
+        raise ValueError("Unable to find the normalizer")
+    mtime = os.stat(normalizer_path).st_mtime_ns
+    with _normalizers_lock:
+        cached = _normalizers.get(normalizer_path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, utils.read_pickle(normalizer_path))
+            _normalizers[normalizer_path] = cached
+        return cached[1]
+
+def save_normalizer(normalizer, feature_type = 'obf'):
+    normalizer_path = config.get('feature.' + feature_type, 'normalizer')
+    utils.dump_pickle(normalizer, normalizer_path)
+    with _normalizers_lock:
+        _normalizers[normalizer_path] = (os.stat(normalizer_path).st_mtime_ns, normalizer)
+
+def scale_in_place(X, normalizer):
+    """apply a fitted MinMaxScaler to a float array in place; the same operations as normalizer.transform"""
+    X *= normalizer.scale_
+    X += normalizer.min_
+    if getattr(normalizer, 'clip', False):
+        np.clip(X, normalizer.feature_range[0], normalizer.feature_range[1], out=X)
+    return X
+
 def normalize_data(X, is_fitting = False, feature_type = 'obf'):
+    """
+    min-max normalization; a scipy.sparse X is fitted block by block and returned as SparseRows rather than densified
+    """
     if is_fitting:
         minmax_norm = MinMaxScaler()
-        normalizer = minmax_norm.fit(X)
-        utils.dump_pickle(normalizer, config.get('feature.' + feature_type, 'normalizer'))
-    elif os.path.exists(config.get('feature.' + feature_type, 'normalizer')) and not is_fitting:
-        normalizer = utils.read_pickle(config.get('feature.' + feature_type, 'normalizer'))
+        if sp.issparse(X):
+            X = X.tocsr()
+            for start in range(0, X.shape[0], SPARSE_BLOCK_ROWS):
+                minmax_norm.partial_fit(X[start: start + SPARSE_BLOCK_ROWS].toarray())
+            normalizer = minmax_norm
+        else:
+            normalizer = minmax_norm.fit(X)
+        save_normalizer(normalizer, feature_type)
     else:
-        raise ValueError("Unable to find the normalizer")
+        normalizer = get_normalizer(feature_type)
+    if sp.issparse(X):
+        return SparseRows(X, normalizer)
     feat_normlized = normalizer.transform(X)
     return feat_normlized
 
@@ -36,6 +111,8 @@ class FeatureMapping(object):
         """
         self.save_dir = feature_save_dir
         self.feature_tp = feature_type
+        self._vocabulary = None
+        self._dictionary = None
 
     def load_features(self):
         if self.feature_tp in feature_type_scope_dict.keys():
@@ -56,37 +133,79 @@ class FeatureMapping(object):
                                                                                                         feature_type_scope_dict.keys())))
         return raw_feature_list
 
-    def select_feature(self, features, gt_label, vocab, vocab_info_dict, dim = 100000):
+    def document_frequency(self, features, gt_label, vocab, batch_size = SELECT_BATCH_ROWS):
+        """
+        count, for every word of the vocabulary, the positive and the negative samples containing it; the token lists
+        are processed batch_size samples at a time, so memory does not grow with the number of samples
+        :return: positive counts, negative counts, number of positives, number of negatives
+        """
+        gt_label = np.asarray(gt_label)
+        df_pos = np.zeros(len(vocab), dtype=np.int64)
+        df_neg = np.zeros(len(vocab), dtype=np.int64)
+        for start in range(0, len(features), batch_size):
+            rows, cols = self._token_indices(vocab, features[start: start + batch_size])
+            cells = np.unique(rows * len(vocab) + cols)  # a word counts once per sample
+            is_pos = gt_label[start + cells // len(vocab)] == 1
+            df_pos += np.bincount(cells[is_pos] % len(vocab), minlength=len(vocab))
+            df_neg += np.bincount(cells[~is_pos] % len(vocab), minlength=len(vocab))
+        n_pos = int(np.sum(gt_label == 1))
+        return df_pos, df_neg, n_pos, len(gt_label) - n_pos
+
+    @staticmethod
+    def _feature_scores(df_pos, df_neg, n_pos, n_neg, ranking = 'frequency'):
+        """
+        score words from their per-class document frequencies
+        'frequency': |frequency in positives - frequency in negatives|
+        'chi2': chi-squared statistic of the 2x2 (word present, label) contingency table
+        'mutual_info': mutual information between word presence and label, in nats
+        """
+        if ranking == 'frequency':
+            # the dense selector summed float16 vectors; while every count is exact in float16 the same arithmetic
+            # is kept so existing vocabularies are reproduced, larger datasets get float64 instead of float16
+            # rounding and overflow
+            dtype = np.float16 if max(n_pos, n_neg) <= 2048 else np.float64
+            return np.abs(df_pos.astype(dtype) / float(n_pos) - df_neg.astype(dtype) / float(n_neg))
+
+        n = float(n_pos + n_neg)
+        # cells of the contingency table: word present/absent x positive/negative
+        observed = np.stack([df_pos, df_neg, n_pos - df_pos, n_neg - df_neg]).astype(np.float64)
+        present = df_pos + df_neg
+        expected = np.stack([present * n_pos, present * n_neg,
+                             (n - present) * n_pos, (n - present) * n_neg]) / n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if ranking == 'chi2':
+                return np.nansum(np.where(expected > 0, (observed - expected) ** 2 / expected, 0.), axis=0)
+            elif ranking == 'mutual_info':
+                return np.nansum(np.where(observed > 0, observed / n * np.log(observed / expected), 0.), axis=0)
+        raise ValueError("Ranking '{}' is not supported, use 'frequency', 'chi2' or 'mutual_info'.".format(ranking))
+
+    def select_feature(self, features, gt_label, vocab, vocab_info_dict, dim = 100000, ranking = 'frequency'):
         """
         select features based on the given dimension, or remove the zero value features.
+        the per-class document frequencies are counted in a streaming pass over the token lists (see
+        document_frequency); words are ranked by frequency difference (default), 'chi2' or 'mutual_info'
         """
         if not isinstance(features, list):
             raise TypeError("A list of features are needed, but here {}.".format(type(features)))
 
-        pos_loc = (gt_label == 1)
-        feature_list_pos = np.array(features)[pos_loc]
-        if len(feature_list_pos) <= 0:
+        df_pos, df_neg, n_pos, n_neg = self.document_frequency(features, gt_label, vocab)
+        if n_pos <= 0:
             raise ValueError("No positives.")
-        feature_vec_pos = self.binary_feature_mapping(vocab, feature_list_pos, short_type=True)
-        feature_frq_pos = np.sum(feature_vec_pos, axis=0) / float(len(feature_vec_pos))
-
-        neg_loc = ~pos_loc
-        feature_list_neg = np.array(features)[neg_loc]
-        if len(feature_list_neg) <= 0:
+        if n_neg <= 0:
             raise ValueError("No negatives.")
-        feature_vec_neg = self.binary_feature_mapping(vocab, feature_list_neg, short_type=True)
-        feature_frq_neg = np.sum(feature_vec_neg, axis=0) / float(len(feature_vec_neg))
 
-        zero_indicator = np.all(feature_vec_pos == 0, axis=0) & np.all(feature_vec_neg == 0, axis=0)
+        zero_indicator = (df_pos == 0) & (df_neg == 0)
         vocab_reduced = list(np.array(vocab)[~zero_indicator])
+        vocab_reduced_set = set(vocab_reduced)
         vocab_info_reduced = defaultdict(set,
-                                         {k: v for k, v in vocab_info_dict.items() if k in vocab_reduced})
+                                         {k: v for k, v in vocab_info_dict.items() if k in vocab_reduced_set})
 
         if len(vocab_reduced) <= dim:
             return vocab_reduced, vocab_info_reduced
         else:
-            feature_frq_diff = np.abs(feature_frq_pos[~zero_indicator] - feature_frq_neg[~zero_indicator])
-            pos_selected = np.argsort(feature_frq_diff)[::-1][:dim]
+            feature_score = self._feature_scores(df_pos[~zero_indicator], df_neg[~zero_indicator], n_pos, n_neg,
+                                                 ranking)
+            pos_selected = np.argsort(feature_score)[::-1][:dim]
 
             vocab_selected = []
             vocab_info_dict_selected = defaultdict(set)
@@ -131,66 +250,130 @@ class FeatureMapping(object):
             raise ValueError("No this type of feature '{}' and the avaiable types are '{}' ".format(self.feature_tp,
                                                                                                     ','.join(
                                                                                                         feature_type_scope_dict.keys())))
-    def binary_feature_mapping(self, vocabulary, feature_list, short_type = False):
+    def _get_dictionary(self, vocabulary):
+        """map each word of the vocabulary to its column; rebuilt only when the vocabulary's content changes"""
+        vocabulary = list(vocabulary)  # a copy, so an in-place edit of the caller's list is noticed next time
+        if self._vocabulary != vocabulary:
+            self._dictionary = dict(zip(vocabulary, range(len(vocabulary))))
+            self._vocabulary = vocabulary
+        return self._dictionary
+
+    def _token_indices(self, vocabulary, feature_list, warn_zero = True):
+        """
+        look up the tokens of all samples in one pass
+        :return: row and column index of every token found in the vocabulary (repeated tokens repeat the pair)
+        """
+        dictionary = self._get_dictionary(vocabulary)
+        lengths = np.fromiter(map(len, feature_list), dtype=np.int64, count=len(feature_list))
+        tokens = itertools.chain.from_iterable(feature_list)
+        cols = np.fromiter(map(dictionary.get, tokens, itertools.repeat(-1)), dtype=np.int64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(feature_list)), lengths)
+        found = cols >= 0
+        rows, cols = rows[found], cols[found]
+
+        zero_vectors = np.sum((lengths > 0) & (np.bincount(rows, minlength=len(feature_list)) == 0))
+        if warn_zero and zero_vectors > 0:
+            logger.warning("Zero feature vector exsits ({} samples).".format(zero_vectors))
+            warnings.warn("Zero feature vector exsits.")
+        return rows, cols
+
+    def binary_feature_mapping(self, vocabulary, feature_list, short_type = False, sparse = False):
+        """
+        map token lists to 0/1 vectors over the vocabulary
+        :param short_type: float16 instead of float32 (dense only)
+        :param sparse: return a float32 scipy.sparse.csr_matrix instead of a dense array
+        """
         if len(vocabulary) == 0:
             print("Return no features")
             return
         if len(feature_list) == 0:
             print("No features")
             return
-        dictionary = dict(zip(vocabulary, range(len(vocabulary))))
-        # feature_vectors = []
-        # for v in feature_list:
-        #     feature_vec = np.zeros((len(dictionary)), dtype=np.float32)
-        #     if len(v) > 0:
-        #         filled_pos = [idx for idx in list(map(dictionary.get, v)) if idx is not None]
-        #         if len(filled_pos) == 0:
-        #             feature_vec[:] = 0.
-        #         else:
-        #             feature_vec[np.array(filled_pos)] = 1.
-        #     feature_vectors.append(feature_vec)
-        # return np.array(feature_vectors)
+        rows, cols = self._token_indices(vocabulary, feature_list)
+        shape = (len(feature_list), len(vocabulary))
+        if sparse:
+            feature_vectors = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+            feature_vectors.sum_duplicates()
+            feature_vectors.data[:] = 1.
+            return feature_vectors
+
         if not short_type:
-            feature_vectors = np.zeros((len(feature_list), len(vocabulary)), dtype = np.float32)
+            feature_vectors = np.zeros(shape, dtype = np.float32)
         else:
-            feature_vectors = np.zeros((len(feature_list), len(vocabulary)), dtype=np.float16)
-        for i, v in enumerate(feature_list):
-            if len(v) > 0:
-                filled_pos = [idx for idx in list(map(dictionary.get, v)) if idx is not None]
-                if len(filled_pos) != 0:
-                    feature_vectors[i, filled_pos] = 1.
-                else:
-                    logger.warning("Zero feature vector exsits.")
-                    warnings.warn("Zero feature vector exsits.")
+            feature_vectors = np.zeros(shape, dtype=np.float16)
+        feature_vectors[rows, cols] = 1.
         return feature_vectors
 
-    def binary_feature_mapping_normalized(self, vocabulary, features, status = 'test'):
+    def binary_feature_mapping_normalized(self, vocabulary, features, status = 'test', sparse = False):
+        if not sparse:
+            return self.map_and_normalize(vocabulary, features, 'binary', status)
 
-        feature_vectors = self.binary_feature_mapping(vocabulary, features)
+        feature_vectors = self.binary_feature_mapping(vocabulary, features, sparse=sparse)
         if status == 'train':
-            return normalize_data(feature_vectors, True)
+            return normalize_data(feature_vectors, True, self.feature_tp)
         else:
-            return normalize_data(feature_vectors)
-
-    def count_feature_mapping(self, vocabulary, features):
-        feature_vectors = []
-        for f in features:
-            feature_dim = len(f)
-            if feature_dim == 0:
-                raise ValueError("No features")
-
-            feature_counter = collections.Counter(f)
-            feature_value = [feature_counter.get(v) if feature_counter.get(v) is not None else 0 for v in vocabulary]
-            feature_vectors.append(feature_value)
-        return np.array(feature_vectors).astype(np.float32)
-
-    def count_feature_mapping_normalized(self, vocabulary, features, status = 'test'):
-        feature_vectors = self.count_feature_mapping(vocabulary, features)
+            return normalize_data(feature_vectors, feature_type=self.feature_tp)
 
+    def count_feature_mapping(self, vocabulary, features, sparse = False):
+        """
+        map token lists to occurrence counts over the vocabulary; the counts of the whole batch are accumulated at once
+        from the (row, column) pairs of all tokens
+        :param sparse: return a float32 scipy.sparse.csr_matrix instead of a dense array
+        """
+        if any(len(f) == 0 for f in features):
+            raise ValueError("No features")
+        rows, cols = self._token_indices(vocabulary, features, warn_zero=False)
+        feature_vectors = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                                        shape=(len(features), len(vocabulary)))  # duplicates are summed
+        if sparse:
+            return feature_vectors
+        return feature_vectors.toarray()
+
+    def count_feature_mapping_normalized(self, vocabulary, features, status = 'test', sparse = False):
+        if not sparse:
+            return self.map_and_normalize(vocabulary, features, 'count', status)
+
+        feature_vectors = self.count_feature_mapping(vocabulary, features, sparse=sparse)
         if status == 'train':
-            return normalize_data(feature_vectors, True)
+            return normalize_data(feature_vectors, True, self.feature_tp)
         else:
-            return normalize_data(feature_vectors)
+            return normalize_data(feature_vectors, feature_type=self.feature_tp)
+
+    def map_and_normalize(self, vocabulary, features, mapping = 'binary', status = 'test',
+                          batch_size = SPARSE_BLOCK_ROWS):
+        """
+        map features into one preallocated float32 matrix, batch_size rows at a time, and min-max scale the rows in
+        place: when testing each batch is scaled as soon as it is mapped; when training the normalizer is fitted on
+        the filled matrix first. The result equals normalize_data(<mapping>(vocabulary, features)) without the
+        intermediate full-size matrix.
+        :param mapping: 'binary' or 'count'
+        :param status: 'train' fits and saves the normalizer, otherwise the saved one is used
+        """
+        if mapping == 'binary':
+            map_batch = self.binary_feature_mapping
+        elif mapping == 'count':
+            map_batch = self.count_feature_mapping
+        else:
+            raise ValueError("Mapping '{}' is not supported, use 'binary' or 'count'.".format(mapping))
+        if len(vocabulary) == 0:
+            raise ValueError("Empty vocabulary, no features to map.")
+        if len(features) == 0:
+            raise ValueError("No samples to map.")
+
+        normalizer = get_normalizer(self.feature_tp) if status != 'train' else None
+        feature_vectors = np.empty((len(features), len(vocabulary)), dtype=np.float32)
+        for start in range(0, len(features), batch_size):
+            block = feature_vectors[start: start + batch_size]
+            block[:] = map_batch(vocabulary, features[start: start + batch_size], sparse=True).toarray()
+            if normalizer is not None:
+                scale_in_place(block, normalizer)
+
+        if normalizer is None:
+            normalizer = MinMaxScaler().fit(feature_vectors)
+            save_normalizer(normalizer, self.feature_tp)
+            for start in range(0, len(features), batch_size):
+                scale_in_place(feature_vectors[start: start + batch_size], normalizer)
+        return feature_vectors
 
 
 feature_type_scope_dict= {
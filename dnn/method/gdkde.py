@@ -10,6 +10,7 @@ import numpy as np
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 sys.path.append(project_root)
 from attacker.methods.attack_method import *
+from learner.dataset_store import get_dataset, has_dataset
 
 DEFAULT_PARAM={
     'step_size': 1.,
@@ -45,23 +46,23 @@ class GDKDE(Attack):
     def _load_neg_data(self, max_num = 100):
         if not isinstance(max_num, int) and max_num < 0:
             raise TypeError("Input must be an positive interger.")
-        if not os.path.exists(config.get("feature." + self.model.info.feature_type, "dataX")) \
-            and not os.path.exists(config.get("feature." + self.model.info.feature_type, "datay")):
+        if not has_dataset(self.model.info.feature_type):
             raise Exception("No " + " feature." + self.model.info.feature_type + ".")
         else:
-            dataX = utils.read_joblib(config.get("feature." + self.model.info.feature_type, "dataX"))
-            datay = utils.read_joblib(config.get("feature." + self.model.info.feature_type, "datay"))
+            dataset = get_dataset(self.model.info.feature_type)
+            dataX = dataset.X('train')
 
-            negative_data_idx = (datay == 0)
-            neg_dataX = dataX[negative_data_idx]
-            if len(neg_dataX) == 0:
+            # sample among the indices and read only the chosen rows from the memory-mapped training split
+            negative_data_idx = dataset.label_index('train', 0)
+            if len(negative_data_idx) == 0:
                 raise ValueError("No negative data.")
-            elif len(neg_dataX) < max_num:
+            elif len(negative_data_idx) < max_num:
                 np.random.seed(0)
-                return neg_dataX[np.random.choice(len(neg_dataX), max_num, replace=True)]
+                chosen_idx = negative_data_idx[np.random.choice(len(negative_data_idx), max_num, replace=True)]
             else:
                 np.random.seed(0)
-                return neg_dataX[np.random.choice(len(neg_dataX), max_num, replace=False)]
+                chosen_idx = negative_data_idx[np.random.choice(len(negative_data_idx), max_num, replace=False)]
+            return np.asarray(dataX[chosen_idx])
 
 
     @staticmethod
@@ -8,6 +8,7 @@ import numpy as np
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 sys.path.append(project_root)
 from attacker.methods.attack_method import *
+from learner.dataset_store import get_dataset, has_dataset
 
 DEFAULT_PARAM = {
     'trial': 10,
@@ -32,20 +33,20 @@ class Mimicry(Attack):
     def _load_data(self, max_num=500):
         if not isinstance(max_num, int) and max_num < 0:
             raise TypeError("Input must be an positive interger.")
-        if not os.path.exists(config.get("feature." + self.model.info.feature_type, "dataX")) \
-                and not os.path.exists(config.get("feature." + self.model.info.feature_type, "datay")):
+        if not has_dataset(self.model.info.feature_type):
             raise Exception("No " + " feature." + self.model.info.feature_type + ".")
         else:
-            dataX, _, _ = utils.read_joblib(config.get("feature." + self.model.info.feature_type, "dataX"))
-            datay, _, _ = utils.read_joblib(config.get("feature." + self.model.info.feature_type, "datay"))
+            dataset = get_dataset(self.model.info.feature_type)
+            dataX, datay = dataset.load('train')
 
+        # only the selected rows are read from the memory-mapped training split
         small_dataX = []
         small_datay = []
         for l in range(self.model.output_dim):
-            _label_idx_arr = (datay == l)
-            max_num = max_num if np.sum(_label_idx_arr) > max_num else np.sum(_label_idx_arr)
-            small_dataX.append(dataX[_label_idx_arr][:max_num])
-            small_datay.append(datay[_label_idx_arr][:max_num])
+            _label_idx_arr = np.flatnonzero(datay == l)
+            max_num = max_num if len(_label_idx_arr) > max_num else len(_label_idx_arr)
+            small_dataX.append(np.asarray(dataX[_label_idx_arr[:max_num]]))
+            small_datay.append(datay[_label_idx_arr[:max_num]])
         return np.concatenate(small_dataX), np.concatenate(small_datay)
 
     def get_trials(self, label):
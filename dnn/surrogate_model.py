@@ -17,6 +17,7 @@ from config import config, logging
 from tools import utils
 from learner.feature_extractor import get_droid_feature, FeatureMapping
 from learner.basic_DNN import BasicDNNModel, tester
+from learner.dataset_store import get_dataset
 from learner import model_scope_dict
 from defender import defense_model_scope_dict
 
@@ -203,8 +204,9 @@ class SurrogateModel(MODLE_TEMP):
     def train(self, trainX = None, trainy = None, valX = None, valy = None):
         """train dnn based malware detector"""
         if trainX is None and trainy is None:
-            trainX, valX, _ = utils.read_joblib(config.get('feature.' + self.feature_tp, 'dataX'))
-            trainy, valy, _ = utils.read_joblib(config.get('feature.' + self.feature_tp, 'datay'))
+            dataset = get_dataset(self.feature_tp)
+            trainX, trainy = dataset.load('train')
+            valX, valy = dataset.load('val')
 
         train_input_supervised = utils.DataProducer(trainX, trainy,
                                                     self.hp_params.batch_size, n_epochs=self.hp_params.n_epochs)
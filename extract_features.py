@@ -0,0 +1,198 @@
+import argparse
+import collections
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import yaml
+
+from features.feature import PEFeatureExtractor
+from features.raw_cache import RawFeatureCache
+from features.store import FeatureStore
+
+logging.basicConfig(filename='feature_extraction.log', level=logging.ERROR)
+
+extractor = None
+
+def load_config(config_file: str):
+    with open(config_file, "r") as f:
+        return yaml.safe_load(f)
+
+def make_extractor(feature_version, features_file, raw_cache_dir, parallel=False):
+    raw_cache = RawFeatureCache(raw_cache_dir) if raw_cache_dir else None
+    return PEFeatureExtractor(feature_version, print_feature_warning=False, features_file=features_file,
+                              raw_cache=raw_cache, parallel=parallel)
+
+def init_worker(feature_version, features_file, raw_cache_dir, parallel):
+    """Give every worker process its own extractor, built once."""
+    global extractor
+    extractor = make_extractor(feature_version, features_file, raw_cache_dir, parallel)
+
+def extract_file(path):
+    """Return (feature vector, sha256, per-feature seconds, error); the file is memory-mapped rather than read."""
+    try:
+        raw = extractor.raw_features(path)
+        return extractor.process_raw_features(raw), raw["sha256"], extractor.last_timings, None
+    except Exception as e:
+        return None, None, {}, str(e)
+
+def subdirs(path):
+    with os.scandir(path) as it:
+        return sorted((entry for entry in it if entry.is_dir()), key=lambda entry: entry.name)
+
+def iter_corpus(compiled_dir, obfuscation=None, compiler=None, suffix='.exe'):
+    """Yield the labels of every binary under <obfuscation>/<compiler>/<user>/<year>/, in a stable order."""
+    for obfuscation_entry in subdirs(compiled_dir):
+        if obfuscation and obfuscation_entry.name != obfuscation:
+            continue
+        for compiler_entry in subdirs(obfuscation_entry.path):
+            if compiler and compiler_entry.name != compiler:
+                continue
+            for user_entry in subdirs(compiler_entry.path):
+                for year_entry in subdirs(user_entry.path):
+                    with os.scandir(year_entry.path) as it:
+                        files = sorted((entry for entry in it if entry.is_file() and entry.name.endswith(suffix)),
+                                       key=lambda entry: entry.name)
+                    for entry in files:
+                        yield {
+                            'path': os.path.relpath(entry.path, compiled_dir),
+                            'obfuscation': obfuscation_entry.name,
+                            'compiler': compiler_entry.name,
+                            'user': user_entry.name,
+                            'year': year_entry.name,
+                            'size': entry.stat().st_size,
+                        }
+
+def imap_bounded(executor, func, items, window):
+    """executor.map that keeps at most `window` tasks in flight instead of submitting the whole corpus."""
+    pending = collections.deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+class Throughput:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.files = 0
+        self.bytes = 0
+
+    def add(self, size):
+        self.files += 1
+        self.bytes += size
+
+    def __str__(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (f"{self.files} files, {self.bytes / 1024 ** 2:.1f} MB in {elapsed:.1f}s "
+                f"({self.files / elapsed:.1f} files/s, {self.bytes / 1024 ** 2 / elapsed:.2f} MB/s)")
+
+def extract_corpus(compiled_dir, store_dir, chunk_rows=4096, workers=None, feature_version=2, features_file='',
+                   raw_cache_dir='', obfuscation=None, compiler=None, parallel_features=False, profile=False):
+    """Extract features for every binary not yet in the store, writing one store chunk per chunk_rows files.
+
+    With a raw feature cache, binaries whose raw features are cached are only hashed, not parsed again.
+    With profile, per-feature wall times are summed per obfuscation and printed at the end.
+    """
+    store = FeatureStore(store_dir)
+    done = store.stored_paths()
+    todo = [labels for labels in iter_corpus(compiled_dir, obfuscation, compiler) if labels['path'] not in done]
+    print(f"{len(done)} binaries already in {store_dir}, {len(todo)} to extract")
+
+    meta = {'feature_version': feature_version, 'features_file': features_file}
+    workers = workers or os.cpu_count() or 1
+    total, chunk_stats, failed = Throughput(), Throughput(), 0
+    vectors, labels = [], []
+    timings = collections.defaultdict(dict)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(feature_version, features_file, raw_cache_dir, parallel_features)) as executor:
+        paths = (os.path.join(compiled_dir, item['path']) for item in todo)
+        for item, (vector, sha256, file_timings, error) in zip(todo, imap_bounded(executor, extract_file, paths,
+                                                                                  workers * 4)):
+            for name, seconds in file_timings.items():
+                entry = timings[item['obfuscation']].setdefault(name, [0, 0.0])
+                entry[0] += 1
+                entry[1] += seconds
+            if error is not None:
+                failed += 1
+                logging.error(f"Feature extraction failed for {item['path']}: {error}")
+                continue
+            vectors.append(vector)
+            labels.append(dict(item, sha256=sha256))
+            total.add(item['size'])
+            chunk_stats.add(item['size'])
+            if len(vectors) == chunk_rows:
+                chunk = store.append(np.vstack(vectors), labels, **meta)
+                print(f"chunk {chunk}: {chunk_stats}")
+                vectors, labels, chunk_stats = [], [], Throughput()
+        if vectors:
+            chunk = store.append(np.vstack(vectors), labels, **meta)
+            print(f"chunk {chunk}: {chunk_stats}")
+
+    print(f"Extracted {total}; {failed} failed (see feature_extraction.log)")
+    if profile:
+        for group, group_timings in sorted(timings.items()):
+            print(PEFeatureExtractor.timing_report(group_timings, f"raw feature timings ({group})"))
+    return store
+
+def revectorize(source_dir, store_dir, compiled_dir, raw_cache_dir, feature_version=2, features_file=''):
+    """Rebuild a feature store from the raw feature cache after process_raw_features or the feature selection
+    changed. Rows are looked up by the sha256 recorded in the source store; only binaries missing from the cache
+    are parsed again."""
+    source, store = FeatureStore(source_dir), FeatureStore(store_dir)
+    done = store.stored_paths()
+    extractor = make_extractor(feature_version, features_file, raw_cache_dir)
+    meta = {'feature_version': feature_version, 'features_file': features_file}
+    start, rows, parsed = time.perf_counter(), 0, 0
+    for chunk in source.chunks():
+        labels = [row for row in source.read_labels(chunk) if row['path'] not in done]
+        if not labels:
+            continue
+        raws = []
+        for row in labels:
+            raw = extractor.raw_cache.get(row['sha256'])
+            if raw is None or not all(fe.name in raw for fe in extractor.features):
+                raw = extractor.raw_features(os.path.join(compiled_dir, row['path']))
+                parsed += 1
+            raws.append(raw)
+        store.append(extractor.process_raw_features_batch(raws), labels, **meta)
+        rows += len(labels)
+        print(f"chunk {chunk}: {rows} rows, {rows / (time.perf_counter() - start):.1f} rows/s")
+    print(f"Re-vectorized {rows} rows into {store_dir} ({parsed} parsed because they were not cached)")
+    return store
+
+if __name__ == "__main__":
+    config = load_config("config.yaml")
+    feature_config = config.get("features", {})
+
+    parser = argparse.ArgumentParser(description="Extract PE features for the compiled corpus into a feature store.")
+    parser.add_argument("--root", default=config["compiled_dir"],
+                        help="compiled corpus laid out as <obfuscation>/<compiler>/<user>/<year>/")
+    parser.add_argument("--store", default=feature_config.get("store", "../../res/features/"))
+    parser.add_argument("--obfuscation", help="only extract this obfuscation, e.g. normal")
+    parser.add_argument("--compiler", help="only extract this compiler, e.g. clang")
+    parser.add_argument("--workers", type=int, default=feature_config.get("workers"),
+                        help="extraction processes (default: one per CPU)")
+    parser.add_argument("--chunk-rows", type=int, default=feature_config.get("chunk_rows", 4096))
+    parser.add_argument("--raw-cache", default=feature_config.get("raw_cache", ""),
+                        help="sha256-keyed raw feature cache directory (empty to disable)")
+    parser.add_argument("--features-file", default=feature_config.get("features_file", ""),
+                        help="JSON {\"features\": [...]} selecting the feature types")
+    parser.add_argument("--parallel-features", action="store_true", default=feature_config.get("parallel", False),
+                        help="run byte-level feature types on threads while LIEF parses")
+    parser.add_argument("--profile", action="store_true", help="report per-feature wall time per obfuscation")
+    parser.add_argument("--revectorize", metavar="SOURCE_STORE",
+                        help="build --store from the raw cache for the binaries in SOURCE_STORE instead of extracting")
+    args = parser.parse_args()
+
+    feature_version = feature_config.get("feature_version", 2)
+    if args.revectorize:
+        if not args.raw_cache:
+            parser.error("--revectorize needs a raw feature cache")
+        revectorize(args.revectorize, args.store, args.root, args.raw_cache, feature_version, args.features_file)
+    else:
+        extract_corpus(args.root, args.store, args.chunk_rows, args.workers, feature_version, args.features_file,
+                       args.raw_cache, args.obfuscation, args.compiler, args.parallel_features, args.profile)
@@ -4,11 +4,28 @@ import hashlib
 import numpy as np
 import os
 import json
+import mmap
+import time
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from scipy import sparse
 from sklearn.feature_extraction import FeatureHasher
 
 LIEF_MAJOR, LIEF_MINOR, _ = lief.__version__.split('.')
 LIEF_EXPORT_OBJECT = int(LIEF_MAJOR) > 0 or ( int(LIEF_MAJOR)==0 and int(LIEF_MINOR) >= 10 )
 LIEF_HAS_SIGNATURE = int(LIEF_MAJOR) > 0 or (int(LIEF_MAJOR) == 0 and int(LIEF_MINOR) >= 11)
+LIEF_PARSE_BYTES = int(LIEF_MAJOR) > 0 or (int(LIEF_MAJOR) == 0 and int(LIEF_MINOR) >= 14)
+
+
+@contextlib.contextmanager
+def open_binary(path):
+    ''' Memory-map a file read-only so features can be computed without reading it into memory '''
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:  # empty files cannot be mapped
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
 
 
 class FeatureType(object):
@@ -16,6 +33,8 @@ class FeatureType(object):
 
     name = ''
     dim = 0
+    # byte-level feature types leave this False; they can run while LIEF parses the binary
+    uses_lief = True
 
     def __repr__(self):
         return '{}({})'.format(self.name, self.dim)
@@ -28,6 +47,13 @@ class FeatureType(object):
         ''' Generate a feature vector from the raw features '''
         raise (NotImplementedError)
 
+    def process_raw_features_batch(self, raw_objs):
+        ''' Generate a 2d array with one feature vector per raw feature object. Feature types that hash their
+        raw features override this to hash the whole batch at once. '''
+        if not raw_objs:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([self.process_raw_features(raw_obj) for raw_obj in raw_objs]).astype(np.float32)
+
     def feature_vector(self, bytez, lief_binary):
         ''' Directly calculate the feature vector from the sample itself. This should only be implemented differently
         if there are significant speedups to be gained from combining the two functions. '''
@@ -39,6 +65,7 @@ class ByteHistogram(FeatureType):
 
     name = 'histogram'
     dim = 256
+    uses_lief = False
 
     def __init__(self):
         super(FeatureType, self).__init__()
@@ -53,6 +80,10 @@ class ByteHistogram(FeatureType):
         normalized = counts / sum
         return normalized
 
+    def process_raw_features_batch(self, raw_objs):
+        counts = np.array(raw_objs, dtype=np.float32).reshape(len(raw_objs), self.dim)
+        return counts / counts.sum(axis=1, keepdims=True)
+
 
 class ByteEntropyHistogram(FeatureType):
     ''' 2d byte/entropy histogram based loosely on (Saxe and Berlin, 2015).
@@ -62,6 +93,7 @@ class ByteEntropyHistogram(FeatureType):
 
     name = 'byteentropy'
     dim = 256
+    uses_lief = False
 
     def __init__(self, step=1024, window=2048):
         super(FeatureType, self).__init__()
@@ -71,6 +103,9 @@ class ByteEntropyHistogram(FeatureType):
     def _entropy_bin_counts(self, block):
         # coarse histogram, 16 bytes per bin
         c = np.bincount(block >> 4, minlength=16)  # 16-bin histogram
+        return self._entropy_bin(c), c
+
+    def _entropy_bin(self, c):
         p = c.astype(np.float32) / self.window
         wh = np.where(c)[0]
         H = np.sum(-p[wh] * np.log2(
@@ -80,10 +115,54 @@ class ByteEntropyHistogram(FeatureType):
         if Hbin == 16:  # handle entropy = 8.0 bits
             Hbin = 15
 
-        return Hbin, c
+        return Hbin
+
+    def _window_counts(self, a):
+        ''' Coarse 16-bin histograms of every window, computed from cumulative per-chunk counts.
+        Windows start every `step` bytes, so with chunks of gcd(step, window) bytes each window is the
+        difference of two rows of the cumulative chunk histogram. '''
+        g = np.gcd(self.step, self.window)
+        n_windows = (a.shape[0] - self.window) // self.step + 1
+        n_chunks = ((n_windows - 1) * self.step + self.window) // g
+
+        nibbles = (a[:n_chunks * g].reshape(n_chunks, g) >> 4).astype(np.intp)
+        nibbles += (np.arange(n_chunks, dtype=np.intp) * 16)[:, None]
+        cumulative = np.zeros((n_chunks + 1, 16), dtype=np.int64)
+        np.cumsum(np.bincount(nibbles.ravel(), minlength=n_chunks * 16).reshape(n_chunks, 16), axis=0,
+                  out=cumulative[1:])
+
+        starts = np.arange(n_windows) * (self.step // g)
+        return cumulative[starts + self.window // g] - cumulative[starts]
+
+    def _entropy_bins(self, counts):
+        ''' Vectorized _entropy_bin over the rows of counts '''
+        p = counts.astype(np.float32) / self.window
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = np.where(counts > 0, -p * np.log2(p), np.float32(0))
+        H2 = terms.sum(axis=1, dtype=np.float32) * 2 * 2
+        Hbin = np.minimum(H2.astype(np.int64), 15)
+
+        # the row sum adds the terms in a different order than the per-window sum, so rows whose
+        # entropy lands next to a bin edge are recomputed exactly as the loop would
+        for i in np.nonzero(np.abs(H2 - np.rint(H2)) < 1e-3)[0]:
+            Hbin[i] = self._entropy_bin(counts[i])
+        return Hbin
 
     def raw_features(self, bytez, lief_binary):
-        output = np.zeros((16, 16), dtype=np.int)
+        output = np.zeros((16, 16), dtype=np.int64)
+        a = np.frombuffer(bytez, dtype=np.uint8)
+        if a.shape[0] < self.window:
+            Hbin, c = self._entropy_bin_counts(a)
+            output[Hbin, :] += c
+        else:
+            counts = self._window_counts(a)
+            np.add.at(output, self._entropy_bins(counts), counts)
+
+        return output.flatten().tolist()
+
+    def _raw_features_loop(self, bytez, lief_binary):
+        ''' Reference per-window implementation of raw_features '''
+        output = np.zeros((16, 16), dtype=int)
         a = np.frombuffer(bytez, dtype=np.uint8)
         if a.shape[0] < self.window:
             Hbin, c = self._entropy_bin_counts(a)
@@ -107,6 +186,10 @@ class ByteEntropyHistogram(FeatureType):
         normalized = counts / sum
         return normalized
 
+    def process_raw_features_batch(self, raw_objs):
+        counts = np.array(raw_objs, dtype=np.float32).reshape(len(raw_objs), self.dim)
+        return counts / counts.sum(axis=1, keepdims=True)
+
 
 class SectionInfo(FeatureType):
     ''' Information about section names, sizes and entropy.  Uses hashing trick
@@ -118,6 +201,8 @@ class SectionInfo(FeatureType):
 
     def __init__(self):
         super(FeatureType, self).__init__()
+        self._pair_hasher = FeatureHasher(50, input_type="pair")
+        self._string_hasher = FeatureHasher(50, input_type="string")
 
     @staticmethod
     def _properties(s):
@@ -156,8 +241,11 @@ class SectionInfo(FeatureType):
         return raw_obj
 
     def process_raw_features(self, raw_obj):
-        sections = raw_obj['sections']
-        general = [
+        return self.process_raw_features_batch([raw_obj])[0]
+
+    def process_raw_features_batch(self, raw_objs):
+        all_sections = [raw_obj['sections'] for raw_obj in raw_objs]
+        general = np.array([[
             len(sections),  # total number of sections
             # number of sections with zero size
             sum(1 for s in sections if s['size'] == 0),
@@ -167,22 +255,24 @@ class SectionInfo(FeatureType):
             sum(1 for s in sections if 'MEM_READ' in s['props'] and 'MEM_EXECUTE' in s['props']),
             # number of W
             sum(1 for s in sections if 'MEM_WRITE' in s['props'])
-        ]
+        ] for sections in all_sections]).reshape(len(raw_objs), 5)
         # gross characteristics of each section
-        section_sizes = [(s['name'], s['size']) for s in sections]
-        section_sizes_hashed = FeatureHasher(50, input_type="pair").transform([section_sizes]).toarray()[0]
-        section_entropy = [(s['name'], s['entropy']) for s in sections]
-        section_entropy_hashed = FeatureHasher(50, input_type="pair").transform([section_entropy]).toarray()[0]
-        section_vsize = [(s['name'], s['vsize']) for s in sections]
-        section_vsize_hashed = FeatureHasher(50, input_type="pair").transform([section_vsize]).toarray()[0]
-        entry_name_hashed = FeatureHasher(50, input_type="string").transform([raw_obj['entry']]).toarray()[0]
-        characteristics = [p for s in sections for p in s['props'] if s['name'] == raw_obj['entry']]
-        characteristics_hashed = FeatureHasher(50, input_type="string").transform([characteristics]).toarray()[0]
-
-        return np.hstack([
-            general, section_sizes_hashed, section_entropy_hashed, section_vsize_hashed, entry_name_hashed,
-            characteristics_hashed
-        ]).astype(np.float32)
+        section_sizes = [[(s['name'], s['size']) for s in sections] for sections in all_sections]
+        section_entropy = [[(s['name'], s['entropy']) for s in sections] for sections in all_sections]
+        section_vsize = [[(s['name'], s['vsize']) for s in sections] for sections in all_sections]
+        # the entry name is hashed character by character, as transform([entry]) always did
+        entry_names = [list(raw_obj['entry']) for raw_obj in raw_objs]
+        characteristics = [[p for s in raw_obj['sections'] for p in s['props'] if s['name'] == raw_obj['entry']]
+                           for raw_obj in raw_objs]
+
+        return sparse.hstack([
+            sparse.csr_matrix(general),
+            self._pair_hasher.transform(section_sizes),
+            self._pair_hasher.transform(section_entropy),
+            self._pair_hasher.transform(section_vsize),
+            self._string_hasher.transform(entry_names),
+            self._string_hasher.transform(characteristics)
+        ]).toarray().astype(np.float32)
 
 
 class ImportsInfo(FeatureType):
@@ -196,6 +286,8 @@ class ImportsInfo(FeatureType):
 
     def __init__(self):
         super(FeatureType, self).__init__()
+        self._library_hasher = FeatureHasher(256, input_type="string")
+        self._import_hasher = FeatureHasher(1024, input_type="string")
 
     def raw_features(self, bytez, lief_binary):
         imports = {}
@@ -217,16 +309,19 @@ class ImportsInfo(FeatureType):
         return imports
 
     def process_raw_features(self, raw_obj):
+        return self.process_raw_features_batch([raw_obj])[0]
+
+    def process_raw_features_batch(self, raw_objs):
         # unique libraries
-        libraries = list(set([l.lower() for l in raw_obj.keys()]))
-        libraries_hashed = FeatureHasher(256, input_type="string").transform([libraries]).toarray()[0]
+        libraries = [list(set([l.lower() for l in raw_obj.keys()])) for raw_obj in raw_objs]
 
         # A string like "kernel32.dll:CreateFileMappingA" for each imported function
-        imports = [lib.lower() + ':' + e for lib, elist in raw_obj.items() for e in elist]
-        imports_hashed = FeatureHasher(1024, input_type="string").transform([imports]).toarray()[0]
+        imports = [[lib.lower() + ':' + e for lib, elist in raw_obj.items() for e in elist] for raw_obj in raw_objs]
 
         # Two separate elements: libraries (alone) and fully-qualified names of imported functions
-        return np.hstack([libraries_hashed, imports_hashed]).astype(np.float32)
+        return sparse.hstack([
+            self._library_hasher.transform(libraries), self._import_hasher.transform(imports)
+        ]).toarray().astype(np.float32)
 
 
 class ExportsInfo(FeatureType):
@@ -239,6 +334,7 @@ class ExportsInfo(FeatureType):
 
     def __init__(self):
         super(FeatureType, self).__init__()
+        self._hasher = FeatureHasher(128, input_type="string")
 
     def raw_features(self, bytez, lief_binary):
         if lief_binary is None:
@@ -257,8 +353,10 @@ class ExportsInfo(FeatureType):
         return clipped_exports
 
     def process_raw_features(self, raw_obj):
-        exports_hashed = FeatureHasher(128, input_type="string").transform([raw_obj]).toarray()[0]
-        return exports_hashed.astype(np.float32)
+        return self.process_raw_features_batch([raw_obj])[0]
+
+    def process_raw_features_batch(self, raw_objs):
+        return self._hasher.transform(raw_objs).toarray().astype(np.float32)
 
 
 class GeneralFileInfo(FeatureType):
@@ -315,6 +413,7 @@ class HeaderFileInfo(FeatureType):
 
     def __init__(self):
         super(FeatureType, self).__init__()
+        self._hasher = FeatureHasher(10, input_type="string")
 
     def raw_features(self, bytez, lief_binary):
         raw_obj = {}
@@ -362,25 +461,33 @@ class HeaderFileInfo(FeatureType):
         return raw_obj
 
     def process_raw_features(self, raw_obj):
-        return np.hstack([
-            raw_obj['coff']['timestamp'],
-            FeatureHasher(10, input_type="string").transform([[raw_obj['coff']['machine']]]).toarray()[0],
-            FeatureHasher(10, input_type="string").transform([raw_obj['coff']['characteristics']]).toarray()[0],
-            FeatureHasher(10, input_type="string").transform([[raw_obj['optional']['subsystem']]]).toarray()[0],
-            FeatureHasher(10, input_type="string").transform([raw_obj['optional']['dll_characteristics']]).toarray()[0],
-            FeatureHasher(10, input_type="string").transform([[raw_obj['optional']['magic']]]).toarray()[0],
-            raw_obj['optional']['major_image_version'],
-            raw_obj['optional']['minor_image_version'],
-            raw_obj['optional']['major_linker_version'],
-            raw_obj['optional']['minor_linker_version'],
-            raw_obj['optional']['major_operating_system_version'],
-            raw_obj['optional']['minor_operating_system_version'],
-            raw_obj['optional']['major_subsystem_version'],
-            raw_obj['optional']['minor_subsystem_version'],
-            raw_obj['optional']['sizeof_code'],
-            raw_obj['optional']['sizeof_headers'],
-            raw_obj['optional']['sizeof_heap_commit'],
-        ]).astype(np.float32)
+        return self.process_raw_features_batch([raw_obj])[0]
+
+    def process_raw_features_batch(self, raw_objs):
+        coff = [raw_obj['coff'] for raw_obj in raw_objs]
+        optional = [raw_obj['optional'] for raw_obj in raw_objs]
+        versions = np.array([[
+            o['major_image_version'],
+            o['minor_image_version'],
+            o['major_linker_version'],
+            o['minor_linker_version'],
+            o['major_operating_system_version'],
+            o['minor_operating_system_version'],
+            o['major_subsystem_version'],
+            o['minor_subsystem_version'],
+            o['sizeof_code'],
+            o['sizeof_headers'],
+            o['sizeof_heap_commit'],
+        ] for o in optional], dtype=np.float64).reshape(len(raw_objs), 11)
+        return sparse.hstack([
+            sparse.csr_matrix(np.array([[c['timestamp']] for c in coff], dtype=np.float64).reshape(-1, 1)),
+            self._hasher.transform([[c['machine']] for c in coff]),
+            self._hasher.transform([c['characteristics'] for c in coff]),
+            self._hasher.transform([[o['subsystem']] for o in optional]),
+            self._hasher.transform([o['dll_characteristics'] for o in optional]),
+            self._hasher.transform([[o['magic']] for o in optional]),
+            sparse.csr_matrix(versions),
+        ]).toarray().astype(np.float32)
 
 
 class StringExtractor(FeatureType):
@@ -388,6 +495,9 @@ class StringExtractor(FeatureType):
 
     name = 'strings'
     dim = 1 + 1 + 1 + 96 + 1 + 1 + 1 + 1 + 1
+    uses_lief = False
+    # literal indicators are counted over windows of this many bytes, so a memory-mapped input is never copied whole
+    chunk_size = 1 << 22
 
     def __init__(self):
         super(FeatureType, self).__init__()
@@ -403,6 +513,55 @@ class StringExtractor(FeatureType):
         self._mz = re.compile(b'MZ')
 
     def raw_features(self, bytez, lief_binary):
+        allstrings = self._allstrings.findall(bytez)
+        if allstrings:
+            # statistics about strings:
+            joined = np.frombuffer(b''.join(allstrings), dtype=np.uint8)
+            avlength = joined.shape[0] / len(allstrings)
+            # map printable characters 0x20 - 0x7f to an int array consisting of 0-95, inclusive
+            c = np.bincount(joined - 0x20, minlength=96)  # histogram count
+            # distribution of characters in printable strings
+            csum = c.sum()
+            p = c.astype(np.float32) / csum
+            wh = np.where(c)[0]
+            H = np.sum(-p[wh] * np.log2(p[wh]))  # entropy
+        else:
+            avlength = 0
+            c = np.zeros((96,), dtype=np.float32)
+            H = 0
+            csum = 0
+
+        features = {
+            'numstrings': len(allstrings),
+            'avlength': avlength,
+            'printabledist': c.tolist(),  # store non-normalized histogram
+            'printables': int(csum),
+            'entropy': float(H),
+        }
+        features.update(self._count_indicators(bytez))
+        return features
+
+    def _count_indicators(self, bytez):
+        ''' Count the path/url/registry/MZ literals chunk by chunk.
+
+        None of the literals can overlap itself, so non-overlapping match counts equal occurrence counts and
+        each chunk counts the occurrences that start inside it, reading len(literal) - 1 bytes past its end.
+        IGNORECASE on a bytes pattern folds ASCII only, exactly like bytes.lower().
+        '''
+        literals = {'paths': ([b'c:\\'], True), 'urls': ([b'http://', b'https://'], True),
+                    'registry': ([b'HKEY_'], False), 'MZ': ([b'MZ'], False)}
+        overlap = max(len(literal) for patterns, _ in literals.values() for literal in patterns) - 1
+        counts = dict.fromkeys(literals, 0)
+        for start in range(0, len(bytez), self.chunk_size):
+            window = bytes(bytez[start:start + self.chunk_size + overlap])  # no copy when bytez is bytes and fits
+            lowered = window.lower()
+            for name, (patterns, ignore_case) in literals.items():
+                data = lowered if ignore_case else window
+                counts[name] += sum(data.count(literal, 0, self.chunk_size + len(literal) - 1) for literal in patterns)
+        return counts
+
+    def _raw_features_findall(self, bytez, lief_binary):
+        ''' Reference implementation of raw_features: per-byte list histogram and one findall per pattern '''
         allstrings = self._allstrings.findall(bytez)
         if allstrings:
             # statistics about strings:
@@ -482,7 +641,18 @@ class DataDirectories(FeatureType):
 class PEFeatureExtractor(object):
     ''' Extract useful features from a PE file, and return as a vector of fixed size. '''
 
-    def __init__(self, feature_version=2, print_feature_warning=True, features_file=''):
+    def __init__(self, feature_version=2, print_feature_warning=True, features_file='', raw_cache=None,
+                 parallel=False):
+        ''' raw_cache is an optional RawFeatureCache: binaries whose sha256 is cached with every selected feature
+        type skip parsing, and newly extracted raw features are added to it.
+        With parallel=True the byte-level feature types run on a thread pool while LIEF parses the binary and the
+        LIEF-dependent feature types run on the result. '''
+        self.raw_cache = raw_cache
+        self.parallel = parallel
+        self._executor = None
+        # wall time per feature type ('lief' is the parse, 'total' the whole raw_features call): name -> [calls, s]
+        self.timings = {}
+        self.last_timings = {}
         self.features = []
         features = {
                     'ByteHistogram': ByteHistogram(),
@@ -519,24 +689,111 @@ class PEFeatureExtractor(object):
             raise Exception(f"EMBER feature version must be 1 or 2. Not {feature_version}")
         self.dim = sum([fe.dim for fe in self.features])
 
+    @staticmethod
+    def _parse_lief(bytez, path=None):
+        ''' Parse without expanding the file into a Python list of ints: LIEF reads the path itself when one
+        is given, and newer LIEF versions accept the buffer directly '''
+        if path is not None:
+            return lief.PE.parse(os.fspath(path))
+        if LIEF_PARSE_BYTES:
+            return lief.PE.parse(bytez if isinstance(bytez, bytes) else bytes(bytez))
+        return lief.PE.parse(list(bytez))
+
     def raw_features(self, bytez):
-        lief_errors = (lief.bad_format, lief.bad_file, lief.pe_error, lief.parser_error, lief.read_out_of_bound,
-                       RuntimeError)
+        ''' bytez is the file content (bytes, memoryview or mmap) or a path to the file, which is then
+        memory-mapped instead of read '''
+        if isinstance(bytez, (str, os.PathLike)):
+            with open_binary(bytez) as mapped:
+                return self._raw_features(mapped, path=bytez)
+        return self._raw_features(bytez)
+
+    def _raw_features(self, bytez, path=None):
+        lookup_start = time.perf_counter()
+        sha256 = hashlib.sha256(bytez).hexdigest()
+        cached = self.raw_cache.get(sha256) if self.raw_cache is not None else None
+        if cached is not None and all(fe.name in cached for fe in self.features):
+            # hashing and the lookup are all the work a hit costs; recorded so last_timings never holds the
+            # previous file's timings
+            elapsed = time.perf_counter() - lookup_start
+            self._record_timings({'cache_hit': elapsed, 'total': elapsed})
+            return cached
+
+        lief_errors = tuple(getattr(lief, error) for error in
+                            ('bad_format', 'bad_file', 'pe_error', 'parser_error', 'read_out_of_bound')
+                            if hasattr(lief, error)) + (RuntimeError,)
+        start = time.perf_counter()
+        timings = {}
+        futures = {}
+        if self.parallel:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=sum(not fe.uses_lief for fe in self.features) or 1,
+                                                    thread_name_prefix='byte-features')
+            futures = {fe.name: self._executor.submit(self._timed_raw_features, timings, fe, bytez, None)
+                       for fe in self.features if not fe.uses_lief}
         try:
-            lief_binary = lief.PE.parse(list(bytez))
-        except lief_errors as e:
-            print("lief error: ", str(e))
-            lief_binary = None
-        except Exception:  # everything else (KeyboardInterrupt, SystemExit, ValueError):
-            raise
-
-        features = {"sha256": hashlib.sha256(bytez).hexdigest()}
-        features.update({fe.name: fe.raw_features(bytez, lief_binary) for fe in self.features})
+            try:
+                lief_binary = self._parse_lief(bytez, path)
+            except lief_errors as e:
+                print("lief error: ", str(e))
+                lief_binary = None
+            except Exception:  # everything else (KeyboardInterrupt, SystemExit, ValueError):
+                raise
+            timings['lief'] = time.perf_counter() - start
+
+            features = {"sha256": sha256}
+            features.update(cached or {})  # keep feature types cached by a differently configured extractor
+            for fe in self.features:
+                if fe.name in futures:
+                    features[fe.name] = futures[fe.name].result()
+                else:
+                    features[fe.name] = self._timed_raw_features(timings, fe, bytez, lief_binary)
+        finally:
+            wait(futures.values())  # the threads read bytez, which the caller may unmap once we return
+        timings['total'] = time.perf_counter() - start
+        self._record_timings(timings)
+
+        if self.raw_cache is not None:
+            self.raw_cache.put(features)
         return features
 
+    @staticmethod
+    def _timed_raw_features(timings, fe, bytez, lief_binary):
+        start = time.perf_counter()
+        raw = fe.raw_features(bytez, lief_binary)
+        timings[fe.name] = time.perf_counter() - start
+        return raw
+
+    def _record_timings(self, timings):
+        self.last_timings = timings
+        for name, seconds in timings.items():
+            entry = self.timings.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    @staticmethod
+    def timing_report(timings, title='raw feature timings'):
+        ''' Format {name: [calls, seconds]} as a table, slowest first, with each share of the total wall time '''
+        total = timings.get('total', [0, 0.0])[1] or 1e-9
+        lines = [f"{title}:", f"  {'feature':<16} {'calls':>8} {'total s':>10} {'mean ms':>10} {'of wall':>8}"]
+        for name, (calls, seconds) in sorted(timings.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {name:<16} {calls:>8} {seconds:>10.2f} {seconds / calls * 1000:>10.2f} "
+                         f"{seconds / total:>8.1%}")
+        return "\n".join(lines)
+
+    def profile_report(self):
+        return self.timing_report(self.timings)
+
     def process_raw_features(self, raw_obj):
         feature_vectors = [fe.process_raw_features(raw_obj[fe.name]) for fe in self.features]
         return np.hstack(feature_vectors).astype(np.float32)
 
+    def process_raw_features_batch(self, raw_objs):
+        ''' Vectorize a list of raw feature objects into a (len(raw_objs), dim) array '''
+        if not raw_objs:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        feature_blocks = [fe.process_raw_features_batch([raw_obj[fe.name] for raw_obj in raw_objs])
+                          for fe in self.features]
+        return np.hstack(feature_blocks).astype(np.float32).reshape(len(raw_objs), self.dim)
+
     def feature_vector(self, bytez):
         return self.process_raw_features(self.raw_features(bytez))
\ No newline at end of file
@@ -0,0 +1,105 @@
+import json
+import os
+
+
+class RawFeatureCache(object):
+    ''' Persistent raw features (the output of PEFeatureExtractor.raw_features) keyed by sha256.
+
+    Records are JSON lines sharded by the first two hex digits of the hash into <root>/<xx>.jsonl. A record is
+    appended with a single O_APPEND write, so several extraction processes can share one cache; when a hash is
+    stored twice the last line wins. Each shard has a sidecar <xx>.idx of "sha256 offset length" lines, appended
+    after the record. A shard is indexed on first use from its .idx, and only the records past the last indexed one
+    (left unindexed by a process that stopped in between, or written before the .idx existed) are read and then
+    added to the .idx, so opening the cache costs nothing and each worker reads little more than the index files.
+    '''
+
+    PREFIX = b'{"sha256": "'
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.shards = {}  # shard path -> {sha256: offset}, filled lazily
+
+    def _shard(self, sha256):
+        return os.path.join(self.root, sha256[:2] + '.jsonl')
+
+    def _shard_index(self, path):
+        index = self.shards.get(path)
+        if index is None:
+            index = self.shards[path] = self._load_shard(path)
+        return index
+
+    def _load_shard(self, path):
+        index, end = {}, 0
+        idx_file = path[:-len('.jsonl')] + '.idx'
+        if os.path.exists(idx_file):
+            with open(idx_file, 'rb') as f:
+                for line in f:
+                    fields = line.split()
+                    # a line cut short by a crash, or one a later append ran into, is ignored
+                    if (line.endswith(b'\n') and len(fields) == 3 and len(fields[0]) == 64
+                            and fields[1].isdigit() and fields[2].isdigit()):
+                        offset, length = int(fields[1]), int(fields[2])
+                        index[fields[0].decode()] = offset
+                        end = max(end, offset + length)
+        if os.path.exists(path):
+            entries = self._scan_shard(path, end)
+            if entries:
+                for sha256, offset, _ in entries:
+                    index[sha256] = offset
+                self._append(idx_file, b''.join(b'%s %d %d\n' % (sha256.encode(), offset, length)
+                                                 for sha256, offset, length in entries))
+        return index
+
+    def _scan_shard(self, path, offset):
+        ''' Return (sha256, offset, length) of every complete record from offset on '''
+        entries = []
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if line.endswith(b'\n'):  # a record cut short by a crash is ignored
+                    if line.startswith(self.PREFIX):
+                        sha256 = line[len(self.PREFIX):len(self.PREFIX) + 64].decode()
+                    else:
+                        sha256 = json.loads(line)['sha256']
+                    entries.append((sha256, offset, len(line)))
+                offset += len(line)
+        return entries
+
+    @staticmethod
+    def _append(path, data):
+        ''' Append data with one O_APPEND write and return the offset it was written at '''
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            end = os.lseek(fd, 0, os.SEEK_CUR)
+        finally:
+            os.close(fd)
+        return end - len(data)
+
+    def __contains__(self, sha256):
+        return sha256 in self._shard_index(self._shard(sha256))
+
+    def __len__(self):
+        ''' Number of cached hashes; indexes every shard '''
+        return sum(len(self._shard_index(os.path.join(self.root, name)))
+                   for name in os.listdir(self.root) if name.endswith('.jsonl'))
+
+    def get(self, sha256):
+        ''' Return the cached raw features of sha256, or None '''
+        path = self._shard(sha256)
+        offset = self._shard_index(path).get(sha256)
+        if offset is None:
+            return None
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def put(self, raw_obj):
+        ''' Append raw features; raw_obj must carry its sha256 as its first key, as raw_features returns it '''
+        line = json.dumps(raw_obj).encode() + b'\n'
+        path = self._shard(raw_obj['sha256'])
+        index = self._shard_index(path)
+        offset = self._append(path, line)
+        self._append(path[:-len('.jsonl')] + '.idx', b'%s %d %d\n' % (raw_obj['sha256'].encode(), offset, len(line)))
+        index[raw_obj['sha256']] = offset
@@ -0,0 +1,89 @@
+import csv
+import json
+import os
+import numpy as np
+
+
+class FeatureStore(object):
+    ''' Feature vectors of a corpus stored as fixed-size chunks.
+
+    Chunk i is chunk_<i>.npy (float32 rows, loadable with mmap_mode='r') plus chunk_<i>.csv with one label row per
+    vector. The CSV is renamed into place last, so a chunk only exists once its labels do and an interrupted write
+    leaves nothing behind that a later run would trust.
+    '''
+
+    LABELS = ['path', 'sha256', 'obfuscation', 'compiler', 'user', 'year', 'size']
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.meta_file = os.path.join(root, 'meta.json')
+        self.meta = {}
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file, encoding='utf8') as f:
+                self.meta = json.load(f)
+
+    def _chunk_path(self, chunk, ext):
+        return os.path.join(self.root, f'chunk_{chunk:05d}.{ext}')
+
+    def chunks(self):
+        ''' Ids of the complete chunks, in order '''
+        return sorted(int(name[6:11]) for name in os.listdir(self.root)
+                      if name.startswith('chunk_') and name.endswith('.csv'))
+
+    def read_labels(self, chunk):
+        with open(self._chunk_path(chunk, 'csv'), newline='', encoding='utf8') as f:
+            return list(csv.DictReader(f))
+
+    def stored_paths(self):
+        return {row['path'] for chunk in self.chunks() for row in self.read_labels(chunk)}
+
+    def __len__(self):
+        return sum(len(self.read_labels(chunk)) for chunk in self.chunks())
+
+    def append(self, vectors, labels, **meta):
+        ''' Write one chunk. meta (e.g. dim and the feature list) is recorded with the first chunk and must match
+        on every later one, so vectors from differently configured extractors never end up in one store. '''
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) != len(labels):
+            raise ValueError(f"{len(vectors)} vectors but {len(labels)} labels")
+        meta = dict(meta, dim=int(vectors.shape[1]))
+        if not self.meta:
+            self._write_json(self.meta_file, meta)
+            self.meta = meta
+        elif self.meta != meta:
+            raise ValueError(f"Feature store {self.root} holds {self.meta}, cannot append {meta}")
+
+        chunks = self.chunks()
+        chunk = chunks[-1] + 1 if chunks else 0
+        npy_file, csv_file = self._chunk_path(chunk, 'npy'), self._chunk_path(chunk, 'csv')
+        with open(npy_file + '.tmp', 'wb') as f:
+            np.save(f, vectors)
+        with open(csv_file + '.tmp', 'w', newline='', encoding='utf8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.LABELS)
+            writer.writeheader()
+            writer.writerows({field: row[field] for field in self.LABELS} for row in labels)
+        os.replace(npy_file + '.tmp', npy_file)
+        os.replace(csv_file + '.tmp', csv_file)
+        return chunk
+
+    @staticmethod
+    def _write_json(path, obj):
+        with open(path + '.tmp', 'w', encoding='utf8') as f:
+            json.dump(obj, f)
+        os.replace(path + '.tmp', path)
+
+    def iter_chunks(self, mmap_mode='r'):
+        ''' Yield (vectors, labels) per chunk; vectors are memory-mapped unless mmap_mode is None '''
+        for chunk in self.chunks():
+            yield np.load(self._chunk_path(chunk, 'npy'), mmap_mode=mmap_mode), self.read_labels(chunk)
+
+    def load(self):
+        ''' Return all vectors as one array and the matching label rows '''
+        vectors, labels = [], []
+        for chunk_vectors, chunk_labels in self.iter_chunks():
+            vectors.append(chunk_vectors)
+            labels.extend(chunk_labels)
+        if not vectors:
+            return np.zeros((0, self.meta.get('dim', 0)), dtype=np.float32), labels
+        return np.concatenate(vectors), labels
@@ -1,12 +1,32 @@
 import os
+import json
+import time
 import asyncio
 
 class Obfuscator:
     def __init__(self, config):
         self.base_path = config["base_path"]
         self.obfuscated_base_path = config["obfuscated_base_path"]
+        # concurrent UPX processes, both for obfuscate_files and for the pack stage of CodeProcessor's pipeline
+        self.workers = config.get("workers") or os.cpu_count() or 1
+        # source binaries packed so far; lets an interrupted run resume where it stopped
+        self.state_file = config.get("state_file") or os.path.join(self.obfuscated_base_path, "packed.json")
+        self.done = self.load_state()
 
-    async def obfuscate_files(self):
+    def load_state(self):
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return set(json.load(f))
+        return set()
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        tmp_file = self.state_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(sorted(self.done), f)
+        os.replace(tmp_file, self.state_file)
+
+    def iter_binaries(self):
         for compiler in os.listdir(self.base_path):
             compiler_path = os.path.join(self.base_path, compiler)
             if os.path.isdir(compiler_path):
@@ -19,25 +39,85 @@ class Obfuscator:
                                 for source_file in os.listdir(year_path):
                                     if source_file.endswith('.exe'):
                                         source_file_path = os.path.join(year_path, source_file)
-                                        await self.obfuscate_file(source_file_path, compiler, user, year)
+                                        yield source_file_path, compiler, user, year
+
+    async def obfuscate_files(self):
+        """Pack every binary of an existing compiled tree (base_path/<compiler>/<user>/<year>/) with self.workers
+        concurrent UPX processes. The done-set is saved when the run ends, also when it is interrupted."""
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+        counts = {"packed": 0, "skipped": 0, "failed": 0}
+        sizes = {"input": 0, "output": 0}
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                status, output_file_path = await self.pack_file(*item)
+                counts[status] += 1
+                if status == "packed":
+                    sizes["input"] += os.path.getsize(item[0])
+                    sizes["output"] += os.path.getsize(output_file_path)
+
+        start = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            for item in self.iter_binaries():
+                await queue.put(item)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            self.save_state()
+
+        ratio = sizes["output"] / sizes["input"] if sizes["input"] else 0.0
+        print(f'UPX: {counts["packed"]} packed, {counts["skipped"]} up to date, {counts["failed"]} failed '
+              f'in {time.perf_counter() - start:.1f}s, overall compression ratio {ratio:.3f}')
 
     async def obfuscate_file(self, source_file_path, compiler, user, year):
+        """Pack one binary with UPX and return the packed path, or None if packing failed."""
+        status, output_file_path = await self.pack_file(source_file_path, compiler, user, year)
+        return output_file_path
+
+    async def pack_file(self, source_file_path, compiler, user, year):
+        """Pack one binary and return (status, packed path), status being 'packed', 'skipped' or 'failed'."""
         source_file_name, source_file_extension = os.path.splitext(os.path.basename(source_file_path))
         packed_file_name = f"{source_file_name}-packed{source_file_extension}"
 
         obfuscated_user_path = os.path.join(self.obfuscated_base_path, compiler, user, year)
-        os.makedirs(obfuscated_user_path, exist_ok=True)
         output_file_path = os.path.join(obfuscated_user_path, packed_file_name)
+        # an output that is not in the done-set may be a partial write from an interrupted run
+        if (source_file_path in self.done and os.path.exists(output_file_path)
+                and os.path.getmtime(output_file_path) >= os.path.getmtime(source_file_path)):
+            return "skipped", output_file_path
+        os.makedirs(obfuscated_user_path, exist_ok=True)
+        # UPX refuses to overwrite an existing -o target, so drop a partial or stale output first
+        if os.path.exists(output_file_path):
+            os.remove(output_file_path)
 
         # Compile using UPX
-        upx_cmd = f'upx --best -k --le -o "{output_file_path}" "{source_file_path}"'
-        print(f'Packing {source_file_path} with UPX...')
+        upx_cmd = ['upx', '--best', '-k', '--le', '-o', output_file_path, source_file_path]
+        start = time.perf_counter()
         try:
-            proc = await asyncio.create_subprocess_shell(upx_cmd)
+            proc = await asyncio.create_subprocess_exec(*upx_cmd, stdout=asyncio.subprocess.DEVNULL)
             await proc.communicate()
             if proc.returncode == 0:
-                print(f'Successfully obfuscated {source_file_path} with UPX')
+                ratio = os.path.getsize(output_file_path) / os.path.getsize(source_file_path)
+                print(f'Packed {source_file_path} with UPX in {time.perf_counter() - start:.2f}s '
+                      f'(compression ratio {ratio:.3f})')
+                self.done.add(source_file_path)
+                if len(self.done) % 100 == 0:
+                    self.save_state()
+                return "packed", output_file_path
             else:
                 print(f'Failed to obfuscated {source_file_path} with UPX')
         except Exception as e:
             print(f'Failed to obfuscated {source_file_path} with UPX: {e}')
+        return "failed", None
+
+if __name__ == "__main__":
+    with open("config.json", "r") as config_file:
+        config = json.load(config_file)
+    asyncio.run(Obfuscator(config["obfuscator"]).obfuscate_files())
@@ -0,0 +1,41 @@
+"""Compare the per-row and bulk GCJDatabase paths.
+
+Usage: python bench_database.py [rows]
+"""
+import os
+import sys
+import hashlib
+import tempfile
+import time
+
+from database import GCJDatabase
+
+def make_rows(n):
+    return [(hashlib.md5(str(i).encode()).hexdigest(), f"user{i % 500}", f"user{i % 500}-{i}.cpp")
+            for i in range(n)]
+
+def timed(label, n, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.3f}s  {n / elapsed:12.0f} rows/s")
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rows = make_rows(n)
+    md5_values = [row[0] for row in rows]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        per_row = GCJDatabase(os.path.join(tmp, 'per_row'))
+        bulk = GCJDatabase(os.path.join(tmp, 'bulk'))
+
+        timed("insert_data (per row)", n, lambda: [per_row.insert_data(*row) for row in rows])
+        timed("insert_many", n, lambda: bulk.insert_many(rows))
+        timed("get_data_by_md5 (per row)", n, lambda: [per_row.get_data_by_md5(md5) for md5 in md5_values])
+        timed("get_many_by_md5", n, lambda: bulk.get_many_by_md5(md5_values))
+
+        per_row.close()
+        bulk.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import os
 import sqlite3
 
+# SQLite's default limit on host parameters in one statement is 999
+MAX_SQL_VARIABLES = 900
+
 class GCJDatabase:
     def __init__(self, base_path, db_name='gcj_dataset.db'):
         if not os.path.exists(base_path):
@@ -8,6 +11,9 @@ class GCJDatabase:
         db_path = os.path.join(base_path, db_name)
 
         self.conn = sqlite3.connect(db_path)
+        # WAL lets a bulk writer commit without an fsync of the main database file per transaction
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
         self.create_table()
 
     def create_table(self):
@@ -16,8 +22,47 @@ class GCJDatabase:
                           (md5_value TEXT PRIMARY KEY,
                            username TEXT NOT NULL,
                            file_name TEXT NOT NULL)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS file_state
+                          (path TEXT PRIMARY KEY,
+                           size INTEGER NOT NULL,
+                           mtime_ns INTEGER NOT NULL,
+                           md5_value TEXT NOT NULL)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS minhash_signature
+                          (path TEXT PRIMARY KEY,
+                           username TEXT NOT NULL,
+                           file_name TEXT NOT NULL,
+                           signature BLOB NOT NULL,
+                           size INTEGER NOT NULL DEFAULT -1,
+                           mtime_ns INTEGER NOT NULL DEFAULT -1)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS lsh_bucket
+                          (band INTEGER NOT NULL,
+                           bucket INTEGER NOT NULL,
+                           path TEXT NOT NULL,
+                           UNIQUE (band, bucket, path))''')
+        self.migrate_minhash_tables(cursor)
         self.conn.commit()
 
+    def migrate_minhash_tables(self, cursor):
+        """Bring minhash tables created by earlier versions up to the current schema"""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(minhash_signature)")}
+        for column in ('size', 'mtime_ns'):
+            if column not in columns:
+                # -1 never matches a real file, so these signatures are recomputed on the next run
+                cursor.execute(f"ALTER TABLE minhash_signature ADD COLUMN {column} INTEGER NOT NULL DEFAULT -1")
+        sql = cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='lsh_bucket'").fetchone()[0]
+        if 'UNIQUE' not in sql:
+            cursor.execute('''CREATE TABLE lsh_bucket_new
+                              (band INTEGER NOT NULL,
+                               bucket INTEGER NOT NULL,
+                               path TEXT NOT NULL,
+                               UNIQUE (band, bucket, path))''')
+            cursor.execute("INSERT OR IGNORE INTO lsh_bucket_new (band, bucket, path) "
+                           "SELECT band, bucket, path FROM lsh_bucket")
+            cursor.execute("DROP TABLE lsh_bucket")
+            cursor.execute("ALTER TABLE lsh_bucket_new RENAME TO lsh_bucket")
+        # the UNIQUE index also serves (band, bucket) lookups
+        cursor.execute("DROP INDEX IF EXISTS lsh_bucket_idx")
+
     def insert_data(self, md5_value, username, file_name):
         cursor = self.conn.cursor()
         try:
@@ -28,10 +73,108 @@ class GCJDatabase:
         except sqlite3.IntegrityError:
             return False
 
+    def insert_many(self, rows):
+        """Insert (md5_value, username, file_name) tuples in a single transaction.
+
+        Rows whose md5_value is already stored are ignored. Returns the number of rows inserted.
+        """
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO gcj_data (md5_value, username, file_name) VALUES (?, ?, ?)",
+                                  rows)
+        return self.conn.total_changes - before
+
     def get_data_by_md5(self, md5_value):
         cursor = self.conn.cursor()
         cursor.execute("SELECT * FROM gcj_data WHERE md5_value=?", (md5_value,))
         return cursor.fetchone()
 
+    def get_many_by_md5(self, md5_values):
+        """Look up many md5 values with one query per MAX_SQL_VARIABLES values.
+
+        Returns {md5_value: row} for the values that are stored.
+        """
+        md5_values = list(md5_values)
+        cursor = self.conn.cursor()
+        found = {}
+        for i in range(0, len(md5_values), MAX_SQL_VARIABLES):
+            batch = md5_values[i:i + MAX_SQL_VARIABLES]
+            placeholders = ','.join('?' * len(batch))
+            cursor.execute(f"SELECT * FROM gcj_data WHERE md5_value IN ({placeholders})", batch)
+            for row in cursor.fetchall():
+                found[row[0]] = row
+        return found
+
+    def delete_many_by_md5(self, md5_values):
+        with self.conn:
+            self.conn.executemany("DELETE FROM gcj_data WHERE md5_value=?", [(md5,) for md5 in md5_values])
+
+    def get_file_states(self):
+        """Return {path: (size, mtime_ns, md5_value)} recorded by the last dedup run"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT path, size, mtime_ns, md5_value FROM file_state")
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    def upsert_file_states(self, rows):
+        """Record (path, size, mtime_ns, md5_value) tuples in a single transaction"""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO file_state (path, size, mtime_ns, md5_value) VALUES (?, ?, ?, ?)",
+                                  rows)
+
+    def delete_file_states(self, paths):
+        with self.conn:
+            self.conn.executemany("DELETE FROM file_state WHERE path=?", [(path,) for path in paths])
+
+    def get_minhash_states(self):
+        """Return {path: (size, mtime_ns)} of every file with a stored signature"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT path, size, mtime_ns FROM minhash_signature")
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    def insert_minhash(self, signature_rows, bucket_rows):
+        """Store (path, username, file_name, signature, size, mtime_ns) and (band, bucket, path) rows in one
+        transaction. The previous buckets of a re-signed path are replaced."""
+        with self.conn:
+            self.conn.executemany("DELETE FROM lsh_bucket WHERE path=?", [(row[0],) for row in signature_rows])
+            self.conn.executemany("INSERT OR REPLACE INTO minhash_signature "
+                                  "(path, username, file_name, signature, size, mtime_ns) VALUES (?, ?, ?, ?, ?, ?)",
+                                  signature_rows)
+            self.conn.executemany("INSERT OR IGNORE INTO lsh_bucket (band, bucket, path) VALUES (?, ?, ?)",
+                                  bucket_rows)
+
+    def delete_minhash(self, paths):
+        """Drop the signatures and buckets of the given paths"""
+        paths = [(path,) for path in paths]
+        with self.conn:
+            self.conn.executemany("DELETE FROM lsh_bucket WHERE path=?", paths)
+            self.conn.executemany("DELETE FROM minhash_signature WHERE path=?", paths)
+
+    def get_lsh_candidates(self, band_buckets):
+        """Return the paths that share at least one of the given (band, bucket) pairs"""
+        band_buckets = list(band_buckets)
+        cursor = self.conn.cursor()
+        paths = set()
+        for i in range(0, len(band_buckets), MAX_SQL_VARIABLES // 2):
+            batch = band_buckets[i:i + MAX_SQL_VARIABLES // 2]
+            values = ','.join(['(?, ?)'] * len(batch))
+            cursor.execute(f"SELECT DISTINCT path FROM lsh_bucket WHERE (band, bucket) IN (VALUES {values})",
+                           [v for pair in batch for v in pair])
+            paths.update(row[0] for row in cursor.fetchall())
+        return paths
+
+    def get_minhash_signatures(self, paths):
+        """Return {path: (username, file_name, signature)} for the given paths"""
+        paths = list(paths)
+        cursor = self.conn.cursor()
+        found = {}
+        for i in range(0, len(paths), MAX_SQL_VARIABLES):
+            batch = paths[i:i + MAX_SQL_VARIABLES]
+            placeholders = ','.join('?' * len(batch))
+            cursor.execute(f"SELECT path, username, file_name, signature FROM minhash_signature "
+                           f"WHERE path IN ({placeholders})", batch)
+            for row in cursor.fetchall():
+                found[row[0]] = row[1:]
+        return found
+
     def close(self):
         self.conn.close()
@@ -1,26 +1,73 @@
 import inspect
 import json
+import os
 import asyncio
 import importlib
 import pkgutil
 from compile.base_compiler import BaseCompiler
 from compile.compiler_interface import CompilerInterface
+from compile.pipeline import Pipeline, Stage
 from obfuscate.obfuscator import Obfuscator
 from md5_checker import MD5Checker
+from near_duplicate import NearDuplicateDetector
 from database import GCJDatabase
 
 class CodeProcessor:
+    """Compile, pack and optionally feature-extract every source as one streaming pipeline.
+
+    Each (source, compiler) item moves to UPX packing as soon as it is compiled, and to feature
+    extraction as soon as it is packed, so the slowest stage sets the overall throughput.
+    """
+
     def __init__(self, config):
         self.compilers = get_compiler_instances(config["compiler"])
         self.obfuscator = Obfuscator(config["obfuscator"])
+        self.pipeline_config = config.get("pipeline", {})
+        self.feature_extractor = None
+        if self.pipeline_config.get("features_output"):
+            from features.feature import PEFeatureExtractor
+            self.feature_extractor = PEFeatureExtractor(print_feature_warning=False)
 
-    async def process_files(self):
-        compile_tasks = []
+    def iter_items(self):
         for compiler in self.compilers:
-            compile_tasks.append(compiler.compile_files())
-        await asyncio.gather(*compile_tasks)
+            for file_path, user, year in compiler.iter_sources():
+                yield {"compiler": compiler, "source": file_path, "user": user, "year": year}
+
+    async def compile_item(self, item):
+        item["binary"] = await item["compiler"].compile_file(item["source"], item["user"], item["year"])
+        return item if item["binary"] else None
+
+    async def pack_item(self, item):
+        item["packed"] = await self.obfuscator.obfuscate_file(item["binary"], item["compiler"].name,
+                                                              item["user"], item["year"])
+        return item if item["packed"] else None
 
-        await self.obfuscator.obfuscate_files()
+    async def extract_item(self, item):
+        def extract():
+            raw = self.feature_extractor.raw_features(item["packed"])
+            raw.update(path=item["packed"], user=item["user"], year=item["year"], compiler=item["compiler"].name)
+            return json.dumps(raw)
+
+        line = await asyncio.get_running_loop().run_in_executor(None, extract)
+        self.features_file.write(line + "\n")
+        return item
+
+    async def process_files(self):
+        workers = self.pipeline_config.get("workers", {})
+        cpu_count = os.cpu_count() or 1
+        stages = [
+            Stage("compile", self.compile_item, workers=workers.get("compile") or cpu_count),
+            Stage("pack", self.pack_item, workers=workers.get("pack") or self.obfuscator.workers),
+        ]
+        try:
+            if self.feature_extractor is None:
+                await Pipeline(stages, self.pipeline_config.get("queue_size", 64)).run(self.iter_items())
+            else:
+                stages.append(Stage("features", self.extract_item, workers=workers.get("features") or cpu_count))
+                with open(self.pipeline_config["features_output"], "a", encoding="utf-8") as self.features_file:
+                    await Pipeline(stages, self.pipeline_config.get("queue_size", 64)).run(self.iter_items())
+        finally:
+            self.obfuscator.save_state()
 
 def get_compiler_instances(config):
     compiler_instances = []
@@ -43,7 +90,13 @@ async def main():
     db = GCJDatabase(config["database_path"])
 
     md5_checker = MD5Checker(config["submissions_path"], db)
-    await md5_checker.process_files()
+    md5_checker.process_files()
+
+    # after the MD5 check, so byte-identical copies are already gone from disk and from the index
+    near_duplicate_config = dict(config.get("near_duplicate", {}))
+    if near_duplicate_config.pop("enabled", True):
+        detector = NearDuplicateDetector(db, **near_duplicate_config)
+        detector.index_files(config["submissions_path"])
 
     db.close()
 
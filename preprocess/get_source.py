@@ -37,6 +37,24 @@ def extract_tar_bz2(filename, dest_folder):
     with tarfile.open(filename, 'r:bz2') as archive:
         archive.extractall(dest_folder)
 
+def read_csv_from_archive(filename, base_name):
+    """Parse the CSV member of a .csv.tar.bz2 archive directly from the decompressed stream"""
+    with tarfile.open(filename, 'r:bz2') as archive:
+        for member in archive:
+            if member.isfile() and os.path.basename(member.name) == f"{base_name}.csv":
+                return pd.read_csv(archive.extractfile(member), encoding='utf-8', dtype={'round': str})
+    raise FileNotFoundError(f"{base_name}.csv not found in {filename}")
+
+def group_cpp_sources(data, file_col, names):
+    """Partition the .cpp rows of the listed users by username in a single pass.
+
+    Returns {username: [flines, ...]} with rows kept in CSV order, replacing one full-frame
+    scan per name.
+    """
+    selected = data[data['username'].isin(set(names)) &
+                    data[file_col].str.lower().str.endswith('.cpp', na=False)]
+    return {name: group.tolist() for name, group in selected.groupby('username', sort=False)['flines']}
+
 def process_files(file_list):
     if not os.path.exists(source_code_folder):
         os.makedirs(source_code_folder)
@@ -45,21 +63,17 @@ def process_files(file_list):
         if src_file.endswith(".csv.tar.bz2"):
             base_name = src_file.split('.')[0]
 
-            extract_tar_bz2(os.path.join(src_folder, src_file), ext_folder)
-
-            csv_file = os.path.join(ext_folder, f"{base_name}.csv")
-            if not os.path.exists(csv_file):
-                logging.error(f"Expected CSV file {csv_file} not found after extraction.")
-                continue
-
-            print("\n============== Extracted csv ==================\n")
-
+            # Users are numbered across years (user_file_count), so archives are read one after another,
+            # but each CSV is parsed straight from the archive instead of being extracted to ext_folder first.
+            csv_file = os.path.join(src_folder, src_file)
             try:
-                data = pd.read_csv(csv_file, encoding='utf-8', dtype={'round': str})
+                data = read_csv_from_archive(csv_file, base_name)
             except Exception as e:
                 logging.error(f"Read CSV Failed for {csv_file}. Error: {e}")
                 continue
 
+            print("\n============== Read csv from archive ==================\n")
+
             file_col = 'full_path' if base_name == 'gcj2020' else 'file'
 
             if not all(col in data.columns for col in ['username', file_col, 'flines']):
@@ -74,23 +88,24 @@ def process_files(file_list):
             with open(names_txt_file, 'r', encoding='utf-8') as f:
                 names = [name.strip() for name in f.readlines()]
 
+            sources_by_user = group_cpp_sources(data, file_col, names)
+
             for name in names:
                 clean_username = clean_name(name)
-                user_data = data[data['username'] == name]
-                cpp_files = user_data[user_data[file_col].str.lower().str.endswith('.cpp')]
+                cpp_files = sources_by_user.get(name, [])
 
                 user_folder = os.path.join(source_code_folder, clean_username)
                 if not os.path.exists(user_folder):
                     os.makedirs(user_folder)
 
                 user_file_count.setdefault(clean_username, 0)
-                for _, record_data in cpp_files.iterrows():
+                for flines in cpp_files:
                     user_file_count[clean_username] += 1
                     file_name = f"{clean_username}-{user_file_count[clean_username]}.cpp"
 
                     try:
                         with open(os.path.join(user_folder, file_name), 'w', encoding='utf-8') as cpp_file:
-                            cpp_file.write(record_data['flines'])
+                            cpp_file.write(flines)
                     except Exception as e:
                         logging.error(f"Write CPP Failed for {file_name}. Error: {e}")
 
@@ -1,34 +1,123 @@
 import os
 import hashlib
+import collections
+from concurrent.futures import ThreadPoolExecutor
 
 class MD5Checker:
-    def __init__(self, base_path):
+    """Remove byte-identical submissions under base_path/<user>/.
+
+    Files are hashed on a thread pool in fixed-size chunks, with at most batch_size hashes in
+    flight, and the results are written to the GCJDatabase in batches, so memory does not grow
+    with the corpus. The (path, size, mtime) of every kept file is recorded, and files that have
+    not changed since the last run are not hashed again. Records of files that are gone from disk
+    are dropped, so a new copy of a deleted file is kept rather than removed as its duplicate.
+    """
+
+    def __init__(self, base_path, db, max_workers=None, batch_size=1000, chunk_size=1 << 20):
         self.base_path = base_path
-        self.md5_dict = {}
+        self.db = db
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
 
     def calculate_md5(self, file_path):
+        md5 = hashlib.md5()
         with open(file_path, 'rb') as file:
-            file_data = file.read()
-            md5 = hashlib.md5(file_data).hexdigest()
-        return md5
+            for chunk in iter(lambda: file.read(self.chunk_size), b''):
+                md5.update(chunk)
+        return md5.hexdigest()
+
+    def scan_files(self):
+        """Yield (file_path, user, file_name, size, mtime_ns) for every .cpp file, in a stable order"""
+        for user in sorted(os.listdir(self.base_path)):
+            user_path = os.path.join(self.base_path, user)
+            if not os.path.isdir(user_path):
+                continue
+            for root, dirs, files in os.walk(user_path):
+                dirs.sort()
+                for file_name in sorted(files):
+                    if file_name.endswith('.cpp'):
+                        file_path = os.path.join(root, file_name)
+                        stat = os.stat(file_path)
+                        yield file_path, user, os.path.relpath(file_path, user_path), stat.st_size, stat.st_mtime_ns
+
+    def process_batch(self, batch):
+        """Keep the first file of each md5 value, remove the rest. batch holds (file info, md5) pairs."""
+        stored = self.db.get_many_by_md5(md5 for _, md5 in batch)
+        # a stored copy that is no longer on disk cannot stand in for the new file
+        stale_md5 = [md5_value for md5_value, row in stored.items()
+                     if not os.path.exists(os.path.join(self.base_path, row[1], row[2]))]
+        for md5_value in stale_md5:
+            del stored[md5_value]
+        self.db.delete_many_by_md5(stale_md5)
+        seen = {}
+        new_rows, new_states, removed_paths = [], [], []
 
-    def process_file(self, file_path, user, file_name):
-        md5_value = self.calculate_md5(file_path)
+        for (file_path, user, file_name, size, mtime_ns), md5_value in batch:
+            existing = stored.get(md5_value) or seen.get(md5_value)
+            if existing is None or existing[1:] == (user, file_name):
+                seen[md5_value] = (md5_value, user, file_name)
+                new_rows.append((md5_value, user, file_name))
+                new_states.append((file_path, size, mtime_ns, md5_value))
+                continue
 
-        if md5_value not in self.md5_dict:
-            self.md5_dict[md5_value] = {'username': user, 'file_name': file_name}
-        else:
-            existing_record = self.md5_dict[md5_value]
             print(f"\nDuplicate MD5 value found: {md5_value}")
-            print(f"Existing record: username: {existing_record['username']}, file_name: {existing_record['file_name']}")
+            print(f"Existing record: username: {existing[1]}, file_name: {existing[2]}")
             print(f"New record: username: {user}, file_name: {file_name}\n")
-
             os.remove(file_path)
+            removed_paths.append(file_path)
+
+        self.db.insert_many(new_rows)
+        self.db.upsert_file_states(new_states)
+        self.db.delete_file_states(removed_paths)
+        return len(new_rows), len(removed_paths)
+
+    def hash_files(self, pending):
+        """Yield (file info, md5) in order, keeping at most batch_size files queued on the pool"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = collections.deque()
+            for info in pending:
+                in_flight.append((info, executor.submit(self.calculate_md5, info[0])))
+                if len(in_flight) >= self.batch_size:
+                    info, future = in_flight.popleft()
+                    yield info, future.result()
+            while in_flight:
+                info, future = in_flight.popleft()
+                yield info, future.result()
 
     def process_files(self):
-        for user in os.listdir(self.base_path):
-            user_path = os.path.join(self.base_path, user)
-            for file_name in os.listdir(user_path):
-                file_path = os.path.join(user_path, file_name)
-                if file_path.endswith('.cpp'):
-                    self.process_file(file_path, user, file_name)
\ No newline at end of file
+        states = self.db.get_file_states()
+        pending, stale_md5 = [], []
+        unchanged = 0
+        seen = set()
+        for info in self.scan_files():
+            seen.add(info[0])
+            state = states.get(info[0])
+            if state is not None and state[:2] == info[3:]:
+                unchanged += 1
+                continue
+            if state is not None:
+                stale_md5.append(state[2])
+            pending.append(info)
+        # files deleted since the last run must not keep their md5 value claimed
+        missing = [path for path in states if path not in seen and not os.path.exists(path)]
+        stale_md5.extend(states[path][2] for path in missing)
+        # the content of a modified file is no longer the one its old md5 row describes
+        self.db.delete_many_by_md5(stale_md5)
+        self.db.delete_file_states(missing)
+
+        kept, removed = 0, 0
+        batch = []
+        for info, md5_value in self.hash_files(pending):
+            batch.append((info, md5_value))
+            if len(batch) >= self.batch_size:
+                batch_kept, batch_removed = self.process_batch(batch)
+                kept, removed = kept + batch_kept, removed + batch_removed
+                batch = []
+        if batch:
+            batch_kept, batch_removed = self.process_batch(batch)
+            kept, removed = kept + batch_kept, removed + batch_removed
+
+        print(f"MD5 check: {unchanged} unchanged, {kept} kept, {removed} duplicates removed, "
+              f"{len(missing)} missing files forgotten")
+        return unchanged, kept, removed
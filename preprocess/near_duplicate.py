@@ -0,0 +1,135 @@
+import os
+import re
+import zlib
+import hashlib
+import numpy as np
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+COMMENT_RE = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+DIRECTIVE_RE = re.compile(r'^\s*#[^\n]*$', re.MULTILINE)
+TOKEN_RE = re.compile(r'[A-Za-z_]\w*|\d[\w.]*|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|\S')
+
+class NearDuplicateDetector:
+    """Find near-duplicate submissions with MinHash signatures and an LSH index.
+
+    Sources are normalized (comments and preprocessor lines removed, whitespace ignored) and cut
+    into token shingles. Each MinHash signature of num_perm values is split into bands of
+    num_perm // bands rows. Two files become candidates when any band hashes to the same bucket,
+    and a candidate is reported when the estimated Jaccard similarity is at least threshold.
+    Signatures and buckets are persisted in the GCJDatabase with the (size, mtime) of each file,
+    so new or modified files are only compared against the index and unchanged files are not read
+    again. num_perm, bands, shingle_size and seed must stay the same for a database.
+    """
+
+    def __init__(self, db, num_perm=128, bands=16, shingle_size=5, threshold=0.8, seed=1, batch_size=1000):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.db = db
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.batch_size = batch_size
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.int64)
+        self.b = rng.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.int64)
+
+    @staticmethod
+    def tokenize(source):
+        source = COMMENT_RE.sub(' ', source)
+        source = DIRECTIVE_RE.sub(' ', source)
+        return TOKEN_RE.findall(source)
+
+    def shingles(self, tokens):
+        k = self.shingle_size
+        if len(tokens) < k:
+            return {zlib.crc32(' '.join(tokens).encode('utf-8'))}
+        return {zlib.crc32(' '.join(tokens[i:i + k]).encode('utf-8')) for i in range(len(tokens) - k + 1)}
+
+    def signature(self, source):
+        x = np.fromiter(self.shingles(self.tokenize(source)), dtype=np.int64) % MERSENNE_PRIME
+        return ((np.outer(self.a, x) + self.b[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+    def band_buckets(self, signature):
+        """(band, bucket) pairs of a signature; the bucket is a signed 64-bit hash of the band's rows"""
+        return [(band, int.from_bytes(hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(),
+                                                      digest_size=8).digest(), 'little', signed=True))
+                for band in range(self.bands)]
+
+    def query(self, signature, band_buckets=None):
+        """Return (path, username, file_name, similarity) for indexed files similar to signature"""
+        candidates = self.db.get_lsh_candidates(band_buckets or self.band_buckets(signature))
+        matches = []
+        for path, (user, file_name, blob) in self.db.get_minhash_signatures(candidates).items():
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.int64) == signature))
+            if similarity >= self.threshold:
+                matches.append((path, user, file_name, similarity))
+        return matches
+
+    def scan_files(self, base_path):
+        """Yield (file_path, user, file_name, size, mtime_ns) for every .cpp file under base_path/<user>/"""
+        for user in sorted(os.listdir(base_path)):
+            user_path = os.path.join(base_path, user)
+            if not os.path.isdir(user_path):
+                continue
+            for root, dirs, files in os.walk(user_path):
+                dirs.sort()
+                for file_name in sorted(files):
+                    if file_name.endswith('.cpp'):
+                        file_path = os.path.join(root, file_name)
+                        stat = os.stat(file_path)
+                        yield file_path, user, os.path.relpath(file_path, user_path), stat.st_size, stat.st_mtime_ns
+
+    def index_files(self, base_path):
+        """Index every new or modified file and return the near-duplicate pairs found.
+
+        Each pair is ((path, user, file_name), (path, user, file_name), similarity), where the first
+        entry is the file that was already indexed. Files removed since the last run (e.g. by
+        MD5Checker) and the old signatures of modified files are dropped from the index first, so
+        they are never reported.
+        """
+        states = self.db.get_minhash_states()
+        todo, seen = [], set()
+        for info in self.scan_files(base_path):
+            seen.add(info[0])
+            if states.get(info[0]) != info[3:]:
+                todo.append(info)
+        stale = [info[0] for info in todo if info[0] in states]
+        stale += [path for path in states if path not in seen and not os.path.exists(path)]
+        self.db.delete_minhash(stale)
+
+        pairs = []
+        signature_rows, bucket_rows = [], []
+        pending = {}
+        for file_path, user, file_name, size, mtime_ns in todo:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                signature = self.signature(f.read())
+            band_buckets = self.band_buckets(signature)
+
+            for path, other_user, other_file, similarity in self.query(signature, band_buckets):
+                pairs.append(((path, other_user, other_file), (file_path, user, file_name), similarity))
+            # files of the current batch are not in the database yet
+            pending_buckets = set(band_buckets)
+            for path, (other_user, other_file, other_signature, other_buckets) in pending.items():
+                if pending_buckets & other_buckets:
+                    similarity = float(np.mean(other_signature == signature))
+                    if similarity >= self.threshold:
+                        pairs.append(((path, other_user, other_file), (file_path, user, file_name), similarity))
+
+            pending[file_path] = (user, file_name, signature, pending_buckets)
+            signature_rows.append((file_path, user, file_name, signature.tobytes(), size, mtime_ns))
+            bucket_rows.extend((band, bucket, file_path) for band, bucket in band_buckets)
+            if len(signature_rows) >= self.batch_size:
+                self.db.insert_minhash(signature_rows, bucket_rows)
+                signature_rows, bucket_rows, pending = [], [], {}
+
+        if signature_rows:
+            self.db.insert_minhash(signature_rows, bucket_rows)
+
+        for (path, user, file_name), (other_path, other_user, other_file), similarity in pairs:
+            print(f"Near duplicate ({similarity:.2f}): {user}/{file_name} ~ {other_user}/{other_file}")
+        print(f"Near-duplicate check: {len(seen) - len(todo)} unchanged, {len(todo)} indexed, "
+              f"{len(stale)} stale entries dropped, {len(pairs)} pairs found")
+        return pairs
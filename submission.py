@@ -1,8 +1,10 @@
 import os
 import tarfile
 import re
+import time
 import logging
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 from tqdm import tqdm
 
@@ -12,6 +14,10 @@ INPUT_TXT_DIR = "../../res/names"
 EXTRACTED_CSV_DIR = "../../res/src-ext"
 OUTPUT_DIR = "../../res/submissions"
 LOG_FILE = "script_execution.log"
+STREAMING = True  # read the CSVs in bounded chunks instead of loading them whole
+CHUNK_SIZE = 20000  # rows per chunk in streaming mode
+PARALLEL_YEARS = True  # read the yearly archives directly, several years at once
+MAX_WORKERS = os.cpu_count() or 1
 
 # Set up logging
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
@@ -35,6 +41,21 @@ def extract_tar_bz2(file_path, extract_dir):
         logging.error(f"Failed to extract {file_path}: {str(e)}")
         raise
 
+def iter_csv_members(file_path):
+    """Yield (member name, file object) for each CSV inside a tar.bz2 archive.
+
+    Members are decompressed on the fly as the CSV parser reads them; nothing is written to
+    EXTRACTED_CSV_DIR.
+    """
+    try:
+        with tarfile.open(file_path, "r:bz2") as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith('.csv'):
+                    yield member.name, tar.extractfile(member)
+    except tarfile.TarError as e:
+        logging.error(f"Failed to stream {file_path}: {str(e)}")
+        raise
+
 def read_names_from_txt(file_path):
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -55,6 +76,20 @@ def read_csv_with_pandas(csv_file):
         logging.error(f"Failed to read CSV file {csv_file}: {str(e)}")
         raise
 
+def iter_csv_chunks(csv_file, year, chunk_size=CHUNK_SIZE):
+    """Yield the CSV (a path or file object) in chunks of at most chunk_size rows, keeping only the columns we need"""
+    file_column, _ = get_file_info(year)
+    try:
+        reader = pd.read_csv(csv_file, usecols=['username', file_column, 'flines'], dtype=str,
+                             chunksize=chunk_size)
+        log_progress(f"Streaming CSV file: {csv_file} ({chunk_size} rows per chunk)")
+        with reader:
+            for chunk in reader:
+                yield chunk
+    except Exception as e:
+        logging.error(f"Failed to read CSV file {csv_file}: {str(e)}")
+        raise
+
 def get_file_info(year):
     if year in ['2018', '2019']:
         return 'file', 'CPP'
@@ -81,6 +116,64 @@ def save_cpp_file(row, year, cpp_count):
         logging.warning(f"Skipped file due to encoding error: {output_file}")
         return 0
 
+def save_cpp_files(df, year, cpp_count, created_dirs):
+    """Write every row of an already filtered frame, creating each output directory only once"""
+    _, file_extension = get_file_info(year)
+    file_extension = file_extension.lower()
+    processed_count, skipped_count = 0, 0
+
+    for username, flines in zip(df['username'].tolist(), df['flines'].tolist()):
+        sanitized_username = sanitize_username(username)
+        cpp_count[username] += 1
+        output_path = os.path.join(OUTPUT_DIR, sanitized_username, year)
+        if output_path not in created_dirs:
+            os.makedirs(output_path, exist_ok=True)
+            created_dirs.add(output_path)
+
+        output_file = f"{sanitized_username}-{year}-{cpp_count[username]}.{file_extension}"
+        try:
+            with open(os.path.join(output_path, output_file), 'w', encoding='utf-8') as cpp_file:
+                cpp_file.write(flines)
+            processed_count += 1
+        except UnicodeEncodeError:
+            logging.warning(f"Skipped file due to encoding error: {output_file}")
+            skipped_count += 1
+
+    return processed_count, skipped_count
+
+def process_csv_stream(csv_file, names, year, chunk_size=CHUNK_SIZE, cpp_count=None):
+    """Streaming counterpart of read_csv_with_pandas + process_csv_and_save_cpp.
+
+    Only one chunk is held in memory at a time, so peak memory does not depend on the CSV size.
+    Pass the same cpp_count to every CSV of a year so their output file numbers do not collide.
+    """
+    if cpp_count is None:
+        cpp_count = defaultdict(int)
+    created_dirs = set()
+    names = set(names)
+    file_column, file_extension = get_file_info(year)
+    total_rows, processed_count, skipped_count = 0, 0, 0
+    start = time.perf_counter()
+    try:
+        for chunk in iter_csv_chunks(csv_file, year, chunk_size):
+            total_rows += len(chunk)
+            filtered = chunk[chunk['username'].isin(names) &
+                             chunk[file_column].str.endswith(file_extension, na=False)]
+            processed, skipped = save_cpp_files(filtered, year, cpp_count, created_dirs)
+            processed_count += processed
+            skipped_count += skipped
+    except Exception as e:
+        logging.error(f"Failed to process CSV data for year {year}: {str(e)}")
+        raise
+
+    elapsed = time.perf_counter() - start
+    rate = total_rows / elapsed if elapsed > 0 else 0.0
+    log_progress(f"Scanned {total_rows} rows for year {year} in {elapsed:.1f}s ({rate:.0f} rows/s)")
+    log_progress(f"Processed {processed_count} {file_extension} files for year {year}")
+    if skipped_count > 0:
+        log_progress(f"Skipped {skipped_count} files due to encoding errors for year {year}")
+    return processed_count, skipped_count
+
 def process_csv_and_save_cpp(df, names, year):
     cpp_count = defaultdict(int)
     skipped_count = 0
@@ -104,6 +197,31 @@ def process_csv_and_save_cpp(df, names, year):
         logging.error(f"Failed to process CSV data for year {year}: {str(e)}")
         raise
 
+def process_year_archive(archive_path, names_file, chunk_size=CHUNK_SIZE):
+    """Decompress, parse and write one yearly archive. Runs inside a worker process."""
+    year = os.path.basename(archive_path)[3:7]
+    names = read_names_from_txt(names_file)
+    processed_count, skipped_count = 0, 0
+    cpp_count = defaultdict(int)  # per archive: output names are <user>-<year>-<n>, shared by all its CSVs
+    for member_name, csv_stream in iter_csv_members(archive_path):
+        log_progress(f"Streaming {member_name} from {archive_path}")
+        processed, skipped = process_csv_stream(csv_stream, names, year, chunk_size, cpp_count)
+        processed_count += processed
+        skipped_count += skipped
+    return year, processed_count, skipped_count
+
+def process_archives_parallel(jobs, max_workers=MAX_WORKERS):
+    """Run process_year_archive for each (archive, names file) pair across a process pool"""
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        futures = {executor.submit(process_year_archive, archive, names_file): archive
+                   for archive, names_file in jobs}
+        for future in as_completed(futures):
+            try:
+                year, processed_count, skipped_count = future.result()
+                log_progress(f"Finished year {year}: {processed_count} written, {skipped_count} skipped")
+            except Exception as e:
+                logging.error(f"Failed to process archive {futures[future]}: {str(e)}")
+
 def main():
     log_progress("Starting script execution")
     
@@ -117,17 +235,29 @@ def main():
         #     if file.endswith('.tar.bz2'):
         #         extract_tar_bz2(os.path.join(INPUT_CSV_DIR, file), EXTRACTED_CSV_DIR)
 
+        archive_jobs = []
         for file in os.listdir(INPUT_TXT_DIR):
             if file.endswith('.txt'):
                 year = file[3:7]
+                archive = os.path.join(INPUT_CSV_DIR, f"gcj{year}.csv.tar.bz2")
+                if PARALLEL_YEARS and os.path.exists(archive):
+                    archive_jobs.append((archive, os.path.join(INPUT_TXT_DIR, file)))
+                    continue
+
                 names = read_names_from_txt(os.path.join(INPUT_TXT_DIR, file))
                 csv_file = os.path.join(EXTRACTED_CSV_DIR, f"gcj{year}.csv")
-                if os.path.exists(csv_file):
+                if os.path.exists(csv_file) and STREAMING:
+                    process_csv_stream(csv_file, names, year)
+                elif os.path.exists(csv_file):
                     df = read_csv_with_pandas(csv_file)
                     process_csv_and_save_cpp(df, names, year)
                 else:
                     logging.warning(f"CSV file for year {year} not found.")
 
+        if archive_jobs:
+            log_progress(f"Processing {len(archive_jobs)} yearly archives with up to {MAX_WORKERS} workers")
+            process_archives_parallel(archive_jobs)
+
         log_progress("Script execution completed successfully")
     except Exception as e:
         logging.error(f"An unexpected error occurred: {str(e)}")